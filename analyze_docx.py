@@ -1,28 +1,78 @@
 
-import docx
-from docx.shared import RGBColor
 import os
 import sys
+import zipfile
+from lxml import etree
+
+# Read word/document.xml straight out of the .docx zip; python-docx's object
+# model is far heavier than this dump needs.
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS = {"w": W_NS}
+W_TAB = f"{{{W_NS}}}tab"
+W_PTAB = f"{{{W_NS}}}ptab"
+W_BR = f"{{{W_NS}}}br"
+W_CR = f"{{{W_NS}}}cr"
+W_NO_BREAK_HYPHEN = f"{{{W_NS}}}noBreakHyphen"
+W_HYPERLINK = f"{{{W_NS}}}hyperlink"
+W_TYPE = f"{{{W_NS}}}type"
+
+_run_content = etree.XPath("w:br | w:cr | w:noBreakHyphen | w:ptab | w:t | w:tab", namespaces=NS)
+_para_content = etree.XPath("w:r | w:hyperlink", namespaces=NS)
+_hyperlink_runs = etree.XPath("w:r", namespaces=NS)
+_run_color = etree.XPath("w:rPr/w:color/@w:val", namespaces=NS)
+
+def run_text(r):
+    """Text of a <w:r>, translating tabs and breaks the way python-docx does."""
+    parts = []
+    for e in _run_content(r):
+        tag = e.tag
+        if tag == W_TAB or tag == W_PTAB:
+            parts.append("\t")
+        elif tag == W_BR:
+            if e.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag == W_CR:
+            parts.append("\n")
+        elif tag == W_NO_BREAK_HYPHEN:
+            parts.append("-")
+        else:
+            parts.append(e.text or "")
+    return "".join(parts)
+
+def paragraph_text(p):
+    parts = []
+    for e in _para_content(p):
+        if e.tag == W_HYPERLINK:
+            parts.extend(run_text(r) for r in _hyperlink_runs(e))
+        else:
+            parts.append(run_text(e))
+    return "".join(parts)
 
 def analyze_docx(path):
-    doc = docx.Document(path)
+    with zipfile.ZipFile(path) as z:
+        with z.open("word/document.xml") as f:
+            tree = etree.parse(f)
+    body = tree.getroot().find("w:body", NS)
+    # Body-level only, matching doc.paragraphs / doc.tables
+    paragraphs = body.findall("w:p", NS)
     print(f"--- Analyzing {os.path.basename(path)} ---")
-    
-    print(f"Total Tables: {len(doc.tables)}")
-    print(f"Total Paragraphs: {len(doc.paragraphs)}")
-    
+
+    print(f"Total Tables: {len(body.findall('w:tbl', NS))}")
+    print(f"Total Paragraphs: {len(paragraphs)}")
+
     print("\n--- Paragraph Dump (First 100) ---")
-    for i, p in enumerate(doc.paragraphs[:100]):
-        text = p.text.strip()
+    for i, p in enumerate(paragraphs[:100]):
+        text = paragraph_text(p).strip()
         if not text: continue
-        
+
         # Check for color runs in this paragraph
         colored_text = []
-        for run in p.runs:
-             if run.font.color and run.font.color.rgb:
-                  # detected color (usually non-black)
-                  colored_text.append(f"'{run.text}'({run.font.color.rgb})")
-                  
+        for r in p.findall("w:r", NS):
+            color = _run_color(r)
+            if color and color[0] != "auto":
+                # detected color (usually non-black)
+                colored_text.append(f"'{run_text(r)}'({color[0].upper()})")
+
         color_info = f" [COLOR: {', '.join(colored_text)}]" if colored_text else ""
         print(f"P{i}: {text}{color_info}")
 
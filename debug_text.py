@@ -1,7 +1,5 @@
 
-from pypdf import PdfReader
-reader = PdfReader("pdfs/1章.pdf")
-text = ""
-for page in reader.pages:
-    text += page.extract_text() + "\n"
-print(text[:2000])
+# Kept for muscle memory; the logic lives in pdf_tools.py
+from pdf_tools import main
+
+main(["text"])
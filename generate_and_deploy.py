@@ -1,36 +1,74 @@
 
+import argparse
+import hashlib
+import mmap
 import os
 import re
 import sys
 import shutil
 import subprocess
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import itemgetter
 from pathlib import Path
 from pypdf import PdfReader
 
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
 # Configuration
 PDF_DIR = Path("pdfs")
 DOCS_DIR = Path("docs")
 TEMPLATE_FILE = Path("template.html")
+TEXT_CACHE_DIR = Path(".cache")
+MMAP_THRESHOLD = 16 << 20 # smaller PDFs are cheaper to read normally
+HASH_CHUNK_SIZE = 1 << 20
 GITHUB_PAGES_BRANCH = "main" # or master, depending on repo
 
+# Templates are compiled once and cached by the environment for the whole run
+_JINJA_ENV = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(str(TEMPLATE_FILE.parent)),
+    auto_reload=False,
+    cache_size=-1,
+    keep_trailing_newline=True,
+) if jinja2 else None
+
+# Precompiled patterns
+_REMOTE_URL_RE = re.compile(r"[:/]([\w-]+)/([\w.-]+?)(\.git)?$")
+_PLACEHOLDER_RE = re.compile(r"\{\{ (\w+) \}\}")
+
+_template_text = None
+
 def run_command(command, cwd=None):
-    """Running shell commands with error handling."""
+    """Run a command given as an argv list (no shell) with error handling."""
     try:
         result = subprocess.run(
             command,
             cwd=cwd,
-            shell=True,
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            capture_output=True,
+            text=True,
+            # Nothing we hold needs protecting from git, and keeping fds lets
+            # CPython use posix_spawn instead of fork+exec
+            close_fds=False
         )
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}")
+        print(f"Error running command: {' '.join(command)}")
         print(e.stderr)
         return None
+    except OSError as e:
+        print(f"Error running command: {' '.join(command)}")
+        print(e)
+        return None
 
 def setup_directories():
     """Create necessary directories."""
@@ -51,20 +89,97 @@ def setup_directories():
              f.write("<html><body><h1>App from {{ title }}</h1><div id='content'>{{ content }}</div></body></html>")
          print("Created dummy template.html")
 
+def extract_text_pymupdf(pdf_path):
+    """Extract text from a single PDF using PyMuPDF, falling back to pypdf."""
+    if pymupdf is None:
+        print("PyMuPDF is not installed, falling back to pypdf")
+        return extract_text_from_pdf(pdf_path)
+    try:
+        doc = pymupdf.open(pdf_path)
+        try:
+            text_content = []
+            for page in doc:
+                if not page.get_fonts():
+                    continue # image-only page, nothing to extract
+                text = page.get_text("text")
+                if text:
+                    text_content.append(text)
+            return "\n".join(text_content)
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"PyMuPDF could not read {pdf_path}, falling back to pypdf: {e}")
+        return extract_text_from_pdf(pdf_path)
+
+def pypdf_page_has_text(page):
+    """Text needs a font resource, so pages without one (scans, images) can be skipped."""
+    resources = page.get("/Resources")
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if "/Font" in resources:
+        return True
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return False
+    # Text can also live inside form XObjects drawn by the page
+    return any(x.get_object().get("/Subtype") == "/Form" for x in xobjects.get_object().values())
+
+def extract_text_pypdf(source):
+    """Extract text with pypdf from a path or a seekable stream."""
+    reader = PdfReader(source)
+    text_content = []
+    for page in reader.pages:
+        if not pypdf_page_has_text(page):
+            continue
+        text = page.extract_text()
+        if text:
+            text_content.append(text)
+    return "\n".join(text_content)
+
 def extract_text_from_pdf(pdf_path):
     """Extract text from a single PDF using pypdf."""
     try:
-        reader = PdfReader(pdf_path)
-        text_content = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_content.append(text)
-        return "\n".join(text_content)
+        if pdf_path.stat().st_size <= MMAP_THRESHOLD:
+            return extract_text_pypdf(pdf_path)
+        # Large PDFs are mapped so pypdf's seeks are served from the page cache
+        # instead of buffering the whole file; pages are read lazily, so the
+        # text has to be extracted while the mapping is still open.
+        with open(pdf_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return extract_text_pypdf(mm)
     except Exception as e:
         print(f"Failed to read {pdf_path}: {e}")
         return ""
 
+# --backend choices. PyMuPDF is faster, but lays the text out differently
+# from what the published pages have always shown.
+EXTRACTORS = {
+    "pypdf": extract_text_from_pdf,
+    "pymupdf": extract_text_pymupdf,
+}
+
+def extract_text_cached(pdf_path, backend="pypdf"):
+    """Extract text, reusing the result from a previous run if the PDF is unchanged."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(pdf_path, "rb") as fh:
+        # Fixed-size reads, so a large PDF is never held in memory just to hash it
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    # The extractor is part of the key since PyMuPDF and pypdf lay text out differently
+    cache_file = TEXT_CACHE_DIR / f"{digest}-{backend}.txt"
+    if cache_file.exists():
+        return cache_file.read_text(encoding="utf-8")
+
+    text = EXTRACTORS[backend](pdf_path)
+    if text:
+        if not TEXT_CACHE_DIR.exists():
+            TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Keep the cache out of the 'git add .' deploy commit
+            (TEXT_CACHE_DIR / ".gitignore").write_text("*\n", encoding="utf-8")
+        cache_file.write_text(text, encoding="utf-8")
+    return text
+
 def parse_pdf_content(text):
     """
     Parse raw PDF text into structured data.
@@ -77,27 +192,32 @@ def parse_pdf_content(text):
 def generate_html(data, chapter_title):
     """Generate HTML content by filling the template."""
     try:
-        with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
-            template = f.read()
-        
-        html = template.replace("{{ content }}", data.get("content", ""))
-        html = html.replace("{{ title }}", chapter_title)
-        
-        for key, value in data.items():
-            html = html.replace(f"{{{{ {key} }}}}", str(value))
-            
-        return html
+        if _JINJA_ENV is not None:
+            template = _JINJA_ENV.get_template(TEMPLATE_FILE.name)
+            return template.render({**data, "title": chapter_title})
+
+        global _template_text
+        if _template_text is None:
+            with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
+                _template_text = f.read()
+
+        # One pass over the template; unknown placeholders are left as they are.
+        # (str.format_map is not usable here since the template is full of CSS/JS braces.)
+        values = {key: str(value) for key, value in data.items()}
+        values["title"] = chapter_title
+        values.setdefault("content", "")
+        return _PLACEHOLDER_RE.sub(lambda m: values.get(m.group(1), m.group(0)), _template_text)
     except Exception as e:
         print(f"Error generating HTML: {e}")
         return "<html><body>Error generating content</body></html>"
 
 def get_github_pages_url():
     """Calculate the GitHub Pages URL from the remote 'origin'."""
-    url = run_command("git remote get-url origin")
+    url = run_command(["git", "remote", "get-url", "origin"])
     if not url:
         return None
     
-    match = re.search(r"[:/]([\w-]+)/([\w.-]+?)(\.git)?$", url)
+    match = _REMOTE_URL_RE.search(url)
     if match:
         user = match.group(1)
         repo = match.group(2)
@@ -108,12 +228,40 @@ def get_chapter_number(filename):
     """Extract chapter number from filename, handling wide chars."""
     # Normalize to NFKC to convert full-width numbers to ascii
     normalized = unicodedata.normalize('NFKC', filename)
-    match = re.search(r'(\d+)', normalized)
-    if match:
-        return int(match.group(1))
+    # Take the first run of digits with a plain scan (no regex needed)
+    start = -1
+    for i, char in enumerate(normalized):
+        if char.isdecimal():
+            if start < 0:
+                start = i
+        elif start >= 0:
+            return int(normalized[start:i])
+    if start >= 0:
+        return int(normalized[start:])
     return 99999 # Sort to end if no number found
 
-def main():
+def process_pdf(pdf_file, chapter_id, position, backend="pypdf"):
+    """Extract, parse and render a single PDF. Runs in a worker process."""
+    print(f"Processing {pdf_file.name}...")
+    raw_text = extract_text_cached(pdf_file, backend)
+    data = parse_pdf_content(raw_text)
+    
+    # Use the number from filename if possible, otherwise list position
+    if chapter_id == 99999:
+         # Fallback if no number in filename (shouldn't happen with current files)
+         chapter_id = position
+    
+    output_filename = f"chapter-{chapter_id:02d}.html"
+    chapter_title = f"Chapter {chapter_id}"
+    html_content = generate_html(data, chapter_title)
+    return output_filename, chapter_title, html_content
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the chapter apps from pdfs/ and deploy them.")
+    parser.add_argument("--backend", choices=sorted(EXTRACTORS), default="pypdf",
+                        help="PDF text extractor (default: pypdf)")
+    args = parser.parse_args(argv)
+    
     print("--- Starting Auto-Deployment Script ---")
     
     # 1. Setup
@@ -122,31 +270,23 @@ def main():
     # 2. Process PDFs
     generated_files = []
     # Sort files naturally (1, 2, ... 10) instead of ASCII (1, 10, 2...)
-    pdf_files = list(PDF_DIR.glob("*.pdf"))
-    pdf_files.sort(key=lambda x: get_chapter_number(x.name))
+    # Decorate-sort-undecorate so each filename is normalized only once
+    decorated = [(get_chapter_number(p.name), p) for p in PDF_DIR.glob("*.pdf")]
+    decorated.sort(key=itemgetter(0))
+    pdf_files = [p for _, p in decorated]
+    chapter_ids = [cid for cid, _ in decorated]
     
     if not pdf_files:
         print("No PDF files found in pdfs/ folder.")
     
-    for pdf_file in pdf_files:
-        print(f"Processing {pdf_file.name}...")
-        raw_text = extract_text_from_pdf(pdf_file)
-        data = parse_pdf_content(raw_text)
-        
-        # Use the number from filename if possible, otherwise list index
-        chapter_id = get_chapter_number(pdf_file.name)
-        if chapter_id == 99999:
-             # Fallback if no number in filename (shouldn't happen with current files)
-             chapter_id = len(generated_files) + 1
-             
-        
-        output_filename = f"chapter-{chapter_id:02d}.html"
+    # PDFs are independent, so extract/parse/render them in parallel and
+    # write the results back in sorted order from this process.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(process_pdf, pdf_files, chapter_ids, range(1, len(pdf_files) + 1),
+                                    repeat(args.backend)))
+    
+    for output_filename, chapter_title, html_content in results:
         output_path = DOCS_DIR / output_filename
-        
-        chapter_title = f"Chapter {chapter_id}"
-        
-        html_content = generate_html(data, chapter_title)
-        
         with open(output_path, "w", encoding="utf-8") as f:
             f.write(html_content)
         
@@ -155,20 +295,20 @@ def main():
 
     # 3. Create Index Page
     print("Creating index.html...")
-    index_content = "<html><head><title>English Apps Index</title></head><body>"
-    index_content += "<h1>English Learning Apps</h1><ul>"
-    for fname, title in generated_files:
-        index_content += f'<li><a href="{fname}">{title}</a></li>'
-    index_content += "</ul></body></html>"
+    index_parts = ["<html><head><title>English Apps Index</title></head><body>",
+                   "<h1>English Learning Apps</h1><ul>"]
+    index_parts.extend(f'<li><a href="{fname}">{title}</a></li>' for fname, title in generated_files)
+    index_parts.append("</ul></body></html>")
+    index_content = "".join(index_parts)
     
     with open(DOCS_DIR / "index.html", "w", encoding="utf-8") as f:
         f.write(index_content)
     
     # 4. Git Deployment
     print("Committing and pushing to Git...")
-    run_command("git add .")
-    run_command('git commit -m "Auto-generated apps from latest PDFs"')
-    run_command(f"git push origin {GITHUB_PAGES_BRANCH}")
+    run_command(["git", "add", "."])
+    run_command(["git", "commit", "-m", "Auto-generated apps from latest PDFs"])
+    run_command(["git", "push", "origin", GITHUB_PAGES_BRANCH])
     
     # 5. Output URLs
     base_url = get_github_pages_url()
@@ -1,113 +1,223 @@
 
+import argparse
 import os
 import re
 import sys
 import json
 import subprocess
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
 from pathlib import Path
-from pypdf import PdfReader
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration
 PDF_DIR = Path("pdfs")
 DOCS_DIR = Path("docs")
 TEMPLATE_FILE = Path("template.html")
+WRITE_BUFFER_SIZE = 1 << 20 # a whole page fits, so each file goes out in one write
+
+# Patterns used inside the per-line / per-item loops, compiled once
+# Single line scanner: an ID line ("1056", "1-1", "1056 The train...") or
+# the F-code / Tip page furniture. Everything else is plain text.
+_LINE_TOKEN_RE = re.compile(r'(?P<ID>(\d+(?:-\d+)?)(.*))|(?P<SKIP>F\s*\d+|Tip)')
+_WS_RE = re.compile(r'\s+')
+# Hiragana/Katakana, CJK Extension A, CJK Unified Ideographs, CJK Compatibility
+# Ideographs, Halfwidth Katakana, CJK Extensions B-H
+_JA_CHAR_RE = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+    r'\U00020000-\U000323af]'
+)
+# Headings skipped while collecting the Japanese prompt
+_JA_SKIP_EXACT = frozenset({"基本"})
+_JA_SKIP_PREFIXES = ("Words to Use",)
+
+# Parser states; small ints compare faster than the old state strings
+FIND_ID, JAPANESE, WAITING_FOR_FULL_SENTENCE, POST_ID_SEARCH, EXPLANATION = range(5)
+# The <title>, the subtitle <h2> and the chapterData block, rewritten in one scan
+_APP_SLOTS_RE = re.compile(
+    r'(?P<title><title>.*?</title>)'
+    r'|(?P<subtitle><h2 id="app-subtitle"(?P<subtitle_attrs>[^>]*)>.*?</h2>)'
+    r'|(?P<data>(?s:const chapterData = \[.*?\];))'
+)
 
 def run_command(command, cwd=None):
+    # command is an argv list; running git directly avoids spawning /bin/sh
     try:
         result = subprocess.run(
             command,
             cwd=cwd,
-            shell=True,
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            capture_output=True,
+            text=True,
+            # Nothing we hold needs protecting from git, and keeping fds lets
+            # CPython use posix_spawn instead of fork+exec
+            close_fds=False
         )
         return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}")
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error running command: {' '.join(command)}")
         return None
 
 def setup_directories():
     if not DOCS_DIR.exists():
         DOCS_DIR.mkdir()
 
+def extract_text_pymupdf(pdf_path):
+    if pymupdf is None:
+        print("PyMuPDF is not installed, falling back to pypdf")
+        return extract_text_pypdf(pdf_path)
+    try:
+        doc = pymupdf.open(pdf_path)
+        try:
+            # Pages without fonts are scans/images: skip them rather than run extraction
+            return "\n".join(page.get_text("text") for page in doc if page.get_fonts())
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"PyMuPDF could not read {pdf_path}, falling back to pypdf: {e}")
+        return extract_text_pypdf(pdf_path)
+
+def pypdf_page_has_text(page):
+    # Text needs a font resource, so pages without one (scans, images) can be skipped
+    resources = page.get("/Resources")
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    if "/Font" in resources:
+        return True
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return False
+    # Text can also live inside form XObjects drawn by the page
+    return any(x.get_object().get("/Subtype") == "/Form" for x in xobjects.get_object().values())
+
 def extract_text_pypdf(pdf_path):
     try:
+        # Imported here so the pymupdf backend doesn't pay pypdf's ~80 ms import
+        from pypdf import PdfReader
         reader = PdfReader(pdf_path)
-        text = ""
+        chunks = []
         for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+            if not pypdf_page_has_text(page):
+                continue
+            # "plain" skips the layout-mode positioning pass
+            t = page.extract_text(extraction_mode="plain")
+            if t:
+                chunks.append(t)
+        return "\n".join(chunks)
     except Exception as e:
         print(f"Error reading {pdf_path}: {e}")
         return ""
 
+# --backend choices. The parser below was tuned on pypdf's line layout, so
+# PyMuPDF is faster but loses items and leaves ligatures in the answers.
+EXTRACTORS = {
+    "pypdf": extract_text_pypdf,
+    "pymupdf": extract_text_pymupdf,
+}
+
 def is_japanese(text):
-    for char in text:
-        if "HIRAGANA" in unicodedata.name(char, "") or "CJK" in unicodedata.name(char, ""):
-            return True
-    return False
+    # ASCII-only strings (most English lines) are flagged as such by CPython
+    if text.isascii():
+        return False
+    # The character-class scan runs in C and stops at the first hit
+    return _JA_CHAR_RE.search(text) is not None
 
 def clean_text(text):
     return text.strip()
 
+def find_spaced(f, text, last=False):
+    """(start, end) of the first (or last) occurrence of text in f, letting each
+    space in text match a run of whitespace in f; None when it isn't there."""
+    i = f.rfind(text) if last else f.find(text)
+    if i != -1:
+        return i, i + len(text)
+    # Rare: f has a double space or a line break inside the match
+    m = None
+    for m in re.finditer(r'\s+'.join(map(re.escape, text.split())), f):
+        if not last:
+            break
+    return m.span() if m else None
+
 def find_answer_part(question, full_sentence):
-    q = re.sub(r'\s+', ' ', question).strip()
-    f = re.sub(r'\s+', ' ', full_sentence).strip()
+    q = _WS_RE.sub(' ', question).strip()
+    # Spans are measured on the sentence as given, so the caller can splice it
+    f = full_sentence
     
-    start_match = re.search(r'[\(（]', q)
-    end_match = re.search(r'[\)）][^\)）]*$', q)
+    # First opening and last closing paren (ASCII or full-width) bound the blanks
+    open_idx = q.find('(')
+    wide_open_idx = q.find('（')
+    if open_idx == -1 or (wide_open_idx != -1 and wide_open_idx < open_idx):
+        open_idx = wide_open_idx
     
-    if not start_match:
+    if open_idx == -1:
         return None
         
-    prefix = q[:start_match.start()].strip()
+    prefix = q[:open_idx].strip()
     suffix = ""
-    if end_match:
-        last_paren_index = -1
-        for i, char in enumerate(q):
-            if char in [')', '）']:
-                last_paren_index = i
-        if last_paren_index != -1:
-             suffix = q[last_paren_index+1:].strip()
+    last_paren_index = max(q.rfind(')'), q.rfind('）'))
+    if last_paren_index != -1:
+         suffix = q[last_paren_index+1:].strip()
 
     start_idx = 0
     if prefix:
-        try:
-             start_idx = f.index(prefix) + len(prefix)
-        except ValueError:
-             pass
+        found = find_spaced(f, prefix)
+        if found:
+            start_idx = found[1]
     
     end_idx = len(f)
     if suffix:
-        try:
-             found = f.rfind(suffix)
-             if found != -1:
-                 end_idx = found
-        except ValueError:
-             pass
+        found = find_spaced(f, suffix, last=True)
+        if found:
+            end_idx = found[0]
              
-    answer = f[start_idx:end_idx].strip()
-    return answer
+    # Strip the span in place so the indices still point into full_sentence;
+    # the answer itself keeps its whitespace runs collapsed, as before
+    span = f[start_idx:end_idx]
+    stripped = span.strip()
+    start_idx += len(span) - len(span.lstrip())
+    return _WS_RE.sub(' ', stripped), start_idx, start_idx + len(stripped)
+
+def scan_lines(text):
+    """Yield (kind, line, match) for every non-empty line; kind is ID, SKIP or TEXT."""
+    match_token = _LINE_TOKEN_RE.match
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line: continue
+        m = match_token(line)
+        yield (m.lastgroup if m else "TEXT"), line, m
 
 def parse_chapter_text(text):
-    lines = text.split('\n')
     items = []
     
     current_item = {}
-    state = "FIND_ID" 
+    current_id = None
+    state = FIND_ID
     
     def save_current():
         if current_item.get('id') and current_item.get('en_full'):
             q = current_item.get('question', '')
             f = current_item.get('en_full', '')
-            ans = find_answer_part(q, f)
+            found = find_answer_part(q, f)
             
-            if ans and ans in f:
+            if found and found[0]:
+                # Wrap only the located span; replace() would also wrap any
+                # other occurrence of a short answer like "to"
+                ans, ans_start, ans_end = found
                 current_item['answer'] = ans
-                current_item['en'] = f.replace(ans, f"{{{ans}}}")
+                current_item['en'] = f"{f[:ans_start]}{{{ans}}}{f[ans_end:]}"
             else:
                  current_item['answer'] = "???"
                  current_item['en'] = f
@@ -115,21 +225,24 @@ def parse_chapter_text(text):
             expl = "\n".join(current_item.get('explanation_lines', [])).strip()
             current_item['explanation'] = expl
             
-            cleanup = {k:v for k,v in current_item.items() if k in ['id', 'ja', 'en', 'answer', 'explanation']}
-            items.append(cleanup)
+            current_item['ja'] = " ".join(current_item['ja'])
+            
+            # Named fields, in the order the old key filter produced them
+            items.append({
+                'id': current_item['id'],
+                'ja': current_item['ja'],
+                'answer': current_item['answer'],
+                'en': current_item['en'],
+                'explanation': current_item['explanation']
+            })
 
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if not line: continue
-        
+    for kind, line, id_match in scan_lines(text):
         # ID detection: 
         # Match '1056' or '1056-1' followed by optional text
-        # Group 1: ID
+        # Group 2: ID
         # Group 3: Rest of line
-        id_match = re.match(r'^(\d+(-\d+)?)(.*)$', line)
-        
-        if id_match:
-            matched_id = id_match.group(1).strip()
+        if kind == "ID":
+            matched_id = id_match.group(2).strip()
             # If the rest starts with '-', it might be '1-1' where first part '1' matched.
             # But the regex `\d+(-\d+)?` is greedy, so `1-1` should be fully matched by group 1.
             # Example: "1056 The train..." -> ID="1056", Rest=" The train..."
@@ -142,16 +255,16 @@ def parse_chapter_text(text):
             # Actually standard regex behavior: `\d+(-\d+)?` will try to match `-1`.
             
             # Transition Logic
-            if current_item and current_item.get('id') == matched_id:
+            if matched_id == current_id:
                 # Repeated ID found
                 if len(rest) > 5 and not is_japanese(rest):
                     # Start of sentence found on same line (Chapter 24 style)
                     current_item['en_full'] = rest
-                    state = "EXPLANATION"
+                    state = EXPLANATION
                     continue
                 else:
                     # ID alone (Chapter 1 style), Sentence follows
-                    state = "POST_ID_SEARCH"
+                    state = POST_ID_SEARCH
                     continue
             
             # Start NEW item
@@ -167,43 +280,41 @@ def parse_chapter_text(text):
             current_item = {
                 'id': matched_id,
                 'explanation_lines': [],
-                'ja': '',
+                'ja': [], # joined once in save_current
                 'question': ''
             }
-            state = "JAPANESE"
+            current_id = matched_id
+            state = JAPANESE
             continue
             
         if not current_item: continue
         
-        if state == "JAPANESE":
-            if line.startswith("Words to Use") or line == "基本":
+        if state == JAPANESE:
+            if line in _JA_SKIP_EXACT or line.startswith(_JA_SKIP_PREFIXES):
                 continue
             
             if is_japanese(line):
-                if current_item['ja']:
-                     current_item['ja'] += " " + line
-                else:
-                     current_item['ja'] = line
+                current_item['ja'].append(line)
             
             elif '(' in line or '（' in line:
                 current_item['question'] = line
-                state = "WAITING_FOR_FULL_SENTENCE"
+                state = WAITING_FOR_FULL_SENTENCE
             else:
                 pass
 
-        elif state == "WAITING_FOR_FULL_SENTENCE":
+        elif state == WAITING_FOR_FULL_SENTENCE:
             pass
 
-        elif state == "POST_ID_SEARCH":
-            if re.match(r'^F\s*\d+', line) or line.startswith("Tip"):
+        elif state == POST_ID_SEARCH:
+            if kind == "SKIP":
                 continue
             if is_japanese(line):
                 continue
             if len(line) > 2:
                 current_item['en_full'] = line
-                state = "EXPLANATION"
+                state = EXPLANATION
         
-        elif state == "EXPLANATION":
+        elif state == EXPLANATION:
              if line == "Words to Use": continue
              current_item['explanation_lines'].append(line)
 
@@ -212,74 +323,104 @@ def parse_chapter_text(text):
         
     return items
 
-def generate_app(chapter_num, items):
+def dump_chapter_data(items):
+    # The array is inlined into a <script>, so compact output is enough
+    if orjson is not None:
+        return orjson.dumps(items).decode("utf-8")
+    return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+
+@lru_cache(maxsize=1)
+def load_template():
+    # Read once per process; main() passes the text on to the workers
     if not TEMPLATE_FILE.exists():
          print("Error: template.html not found")
          return ""
-         
     with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
-        template = f.read()
+        return f.read()
+
+def generate_app(chapter_num, items, template=None):
+    if template is None:
+        template = load_template()
+    if not template:
+         return ""
     
     chapter_title_text = f"Chapter {chapter_num}"
-    template = re.sub(r'<title>.*?</title>', f'<title>Insight App - {chapter_title_text}</title>', template)
-    template = re.sub(
-        r'<h2 id="app-subtitle"([^>]*)>.*?</h2>', 
-        f'<h2 id="app-subtitle"\\1>学習用サイト（{chapter_title_text}）</h2>', 
-        template
-    )
+    json_data = dump_chapter_data(items)
     
-    json_data = json.dumps(items, ensure_ascii=False, indent=4)
-    start_marker = "const chapterData = ["
-    end_marker = "];"
+    def fill_slot(match):
+        slot = match.lastgroup
+        if slot == "title":
+            return f'<title>Insight App - {chapter_title_text}</title>'
+        if slot == "subtitle":
+            return f'<h2 id="app-subtitle"{match.group("subtitle_attrs")}>学習用サイト（{chapter_title_text}）</h2>'
+        return f"const chapterData = {json_data};"
     
-    start_idx = template.find(start_marker)
-    if start_idx != -1:
-         end_idx = template.find(end_marker, start_idx)
-         if end_idx != -1:
-             new_code = f"const chapterData = {json_data};"
-             template = template[:start_idx] + new_code + template[end_idx+2:]
-    
-    return template
+    return _APP_SLOTS_RE.sub(fill_slot, template)
 
+@lru_cache(maxsize=None)
 def get_chapter_number(filename):
     normalized = unicodedata.normalize('NFKC', filename)
-    match = re.search(r'(\d+)', normalized)
-    if match: return int(match.group(1))
+    # First run of digits, found with a plain scan instead of a regex
+    start = -1
+    for i, char in enumerate(normalized):
+        if char.isdecimal():
+            if start < 0: start = i
+        elif start >= 0:
+            return int(normalized[start:i])
+    if start >= 0: return int(normalized[start:])
     return 999
 
-def main():
+def process_pdf(pdf_file, chap_num, template, backend="pypdf"):
+    print(f"Processing {pdf_file.name}...")
+    raw_text = EXTRACTORS[backend](pdf_file)
+    
+    items = parse_chapter_text(raw_text)
+    print(f"Extracted {len(items)} items.")
+    
+    html_content = generate_app(chap_num, items, template)
+    
+    output_name = f"chapter-{chap_num:02d}.html"
+    return output_name, f"Chapter {chap_num}", html_content
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the chapter apps from pdfs/ and deploy them.")
+    parser.add_argument("--backend", choices=sorted(EXTRACTORS), default="pypdf",
+                        help="PDF text extractor (default: pypdf)")
+    args = parser.parse_args(argv)
+    
     print("--- Insight App Generator V2.2 (Regex Fix) ---")
     setup_directories()
     
-    files = list(PDF_DIR.glob("*.pdf"))
-    files.sort(key=lambda x: get_chapter_number(x.name))
+    # Decorate-sort-undecorate so each filename is normalized only once
+    decorated = [(get_chapter_number(p.name), p) for p in PDF_DIR.glob("*.pdf")]
+    decorated.sort(key=itemgetter(0))
+    files = [p for _, p in decorated]
+    chapter_ids = [num for num, _ in decorated]
     
     generated_links = []
+    # Read once here and hand the text to the workers
+    template = load_template()
     
-    for pdf_file in files:
-        print(f"Processing {pdf_file.name}...")
-        raw_text = extract_text_pypdf(pdf_file)
-        
-        items = parse_chapter_text(raw_text)
-        print(f"Extracted {len(items)} items.")
-        
-        chap_num = get_chapter_number(pdf_file.name)
-        html_content = generate_app(chap_num, items)
-        
-        output_name = f"chapter-{chap_num:02d}.html"
+    # Each PDF is independent: extract + parse + render in worker processes,
+    # then write the pages from here in chapter order.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(process_pdf, files, chapter_ids, repeat(template), repeat(args.backend)))
+    
+    for output_name, title, html_content in results:
         output_path = DOCS_DIR / output_name
         
-        with open(output_path, "w", encoding="utf-8") as f:
+        with open(output_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
             f.write(html_content)
             
-        generated_links.append((output_name, f"Chapter {chap_num}"))
+        generated_links.append((output_name, title))
         print(f"Saved {output_name}")
 
     print("Updating Index...")
     index_path = DOCS_DIR / "index.html"
-    list_items = ""
-    for fname, title in generated_links:
-        list_items += f'<li class="mb-2"><a href="{fname}" class="text-blue-600 hover:underline">{title}</a></li>'
+    list_items = "".join(
+        f'<li class="mb-2"><a href="{fname}" class="text-blue-600 hover:underline">{title}</a></li>'
+        for fname, title in generated_links
+    )
     
     index_html = f"""
     <!DOCTYPE html>
@@ -300,14 +441,15 @@ def main():
     </body>
     </html>
     """
-    with open(index_path, "w", encoding="utf-8") as f:
+    with open(index_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
         f.write(index_html)
 
     print("Deploying...")
     # Clean check
-    run_command("git add .")
-    run_command('git commit -m "Fix parsing regression for Chapter 24"', cwd=os.getcwd())
-    run_command("git push origin main", cwd=os.getcwd())
+    # 'git add .' stays separate: 'commit -a' would miss newly generated pages
+    run_command(["git", "add", "."])
+    run_command(["git", "commit", "-m", "Fix parsing regression for Chapter 24"])
+    run_command(["git", "push", "origin", "main"])
     print("Done!")
 
 if __name__ == "__main__":
@@ -1,32 +1,91 @@
 
+import hashlib
 import os
 import re
 import sys
 import json
 import subprocess
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from pypdf import PdfReader
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration
 PDF_DIR = Path("pdfs")
 DOCS_DIR = Path("docs")
 TEMPLATE_FILE = Path("template.html")
+ITEMS_CACHE_DIR = Path(".cache")
+HASH_CHUNK_SIZE = 1 << 20
+
+# Parsed items depend on this file as much as on the PDF, so editing the
+# parser invalidates every cached chapter
+_PARSER_DIGEST = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).digest()
+
+# Hiragana/Katakana, CJK Extension A, CJK Unified Ideographs, CJK Compatibility
+# Ideographs, Halfwidth Katakana, CJK Extensions B-H
+_JA_CHAR_RE = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+    r'\U00020000-\U000323af]'
+)
+
+# Patterns used per line / per item, compiled once
+_TIP_RE = re.compile(r'^Tip')
+_FCODE_RE = re.compile(r'^F\s*\d+')
+_CHAPTER_RE = re.compile(r'^Chapter\s*\d+', re.IGNORECASE)
+# A bare sub-ID ("-2＝"), or an ID with whatever text follows it on the line
+_ID_LINE_RE = re.compile(r'^(?:(?P<sub>-\d+)(?:＝)?|(?P<id>\d+(?:-\d+)?)(?:\s+(?P<rest>.*))?)$')
+_BLANK_RE = re.compile(r'[\(（].*?[\)）]')
+_TITLE_RE = re.compile(r'<title>.*?</title>')
+_SUBTITLE_RE = re.compile(r'<h2 id="app-subtitle"([^>]*)>.*?</h2>')
+_NUM_RE = re.compile(r'\d+')
+# First characters of the garbage lines above ("Chapter" is matched case-insensitively)
+_GARBAGE_FIRST_CHARS = frozenset("TFWCc基")
+
+# Placeholders load_template() leaves in the template
+CHAPTER_SENTINEL = "{{CHAPTER}}"
+DATA_SENTINEL = "{{DATA}}"
+
+# docs/index.html; the markup (indentation included) is unchanged from the inline version
+INDEX_TEMPLATE = """
+    <!DOCTYPE html>
+    <html lang="ja">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Insight English Apps Index</title>
+        <script src="https://cdn.tailwindcss.com"></script>
+    </head>
+    <body class="bg-gray-100 p-8">
+        <div class="max-w-xxl mx-auto bg-white p-8 rounded shadow">
+            <h1 class="text-3xl font-bold mb-6">Insight English Apps</h1>
+            <ul class="list-disc pl-5">
+                {list_items}
+            </ul>
+        </div>
+    </body>
+    </html>
+    """
 
 def run_command(command, cwd=None):
+    # command is an argv list; running git directly avoids spawning /bin/sh
     try:
         result = subprocess.run(
             command,
             cwd=cwd,
-            shell=True,
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            capture_output=True,
+            text=True,
+            close_fds=False
         )
         return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}")
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error running command: {' '.join(command)}")
         return None
 
 def setup_directories():
@@ -36,89 +95,113 @@ def setup_directories():
 def extract_text_pypdf(pdf_path):
     try:
         reader = PdfReader(pdf_path)
-        text = ""
+        parts = []
         for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+            parts.append(page.extract_text())
+            parts.append("\n")
+        return "".join(parts)
     except Exception as e:
         print(f"Error reading {pdf_path}: {e}")
         return ""
 
 def is_japanese(text):
-    for char in text:
-        try:
-            name = unicodedata.name(char, "")
-            if "HIRAGANA" in name or "KATAKANA" in name or "CJK" in name:
-                return True
-        except:
-            pass
-    return False
+    # ASCII-only strings (most English lines) are flagged as such by CPython
+    if text.isascii():
+        return False
+    # The character-class scan runs in C and stops at the first hit
+    return _JA_CHAR_RE.search(text) is not None
+
+def find_spaced(f, text, last=False):
+    """(start, end) of the first (or last) occurrence of text in f, letting each
+    space in text match a run of whitespace in f; None when it isn't there."""
+    i = f.rfind(text) if last else f.find(text)
+    if i != -1:
+        return i, i + len(text)
+    # Rare: f has a double space or a line break inside the match
+    m = None
+    for m in re.finditer(r'\s+'.join(map(re.escape, text.split())), f):
+        if not last:
+            break
+    return m.span() if m else None
 
 def find_answer_part(question, full_sentence):
-    q = re.sub(r'\s+', ' ', question).strip()
-    f = re.sub(r'\s+', ' ', full_sentence).strip()
+    # split() drops leading/trailing whitespace and collapses runs, like \s+ -> ' '
+    q = ' '.join(question.split())
+    # Spans are measured on the sentence as given, so the caller can splice it
+    f = full_sentence
     
-    start_match = re.search(r'[\(（]', q)
-    end_match = re.search(r'[\)）][^\)）]*$', q)
+    # First opening paren, ASCII or full-width; plain finds instead of a
+    # character-class search
+    open_idx = q.find('(')
+    wide_open_idx = q.find('（')
+    if open_idx == -1 or (wide_open_idx != -1 and wide_open_idx < open_idx):
+        open_idx = wide_open_idx
     
-    if not start_match:
+    if open_idx == -1:
         return None
         
-    prefix = q[:start_match.start()].strip()
+    prefix = q[:open_idx].strip()
     suffix = ""
-    if end_match:
-        last_paren_index = -1
-        for i, char in enumerate(q):
-            if char in [')', '）']:
-                last_paren_index = i
-        if last_paren_index != -1:
-             suffix = q[last_paren_index+1:].strip()
+    # rfind already tells us whether there is a closing paren at all
+    last_paren_index = max(q.rfind(')'), q.rfind('）'))
+    if last_paren_index != -1:
+         suffix = q[last_paren_index+1:].strip()
 
     start_idx = 0
     if prefix:
-        try:
-             start_idx = f.index(prefix) + len(prefix)
-        except ValueError:
-             pass
+        found = find_spaced(f, prefix)
+        if found:
+            start_idx = found[1]
     
     end_idx = len(f)
     if suffix:
-        try:
-             found = f.rfind(suffix)
-             if found != -1:
-                 end_idx = found
-        except ValueError:
-             pass
+        found = find_spaced(f, suffix, last=True)
+        if found:
+            end_idx = found[0]
              
-    answer = f[start_idx:end_idx].strip()
-    return answer
+    # Strip the span in place so the indices still point into full_sentence;
+    # the answer itself keeps its whitespace runs collapsed, as before
+    span = f[start_idx:end_idx]
+    stripped = span.strip()
+    start_idx += len(span) - len(span.lstrip())
+    return ' '.join(stripped.split()), start_idx, start_idx + len(stripped)
 
 def classify_line(line):
     line = line.strip()
     if not line: return "EMPTY", None
     
-    if re.match(r'^Tip', line): return "GARBAGE", None
-    if re.match(r'^F\s*\d+', line): return "GARBAGE", None
-    if line.startswith("Words to Use") or line == "基本": return "GARBAGE", None
-    if re.match(r'^Chapter\s*\d+', line, re.IGNORECASE): return "GARBAGE", None
+    # Most lines can't be page furniture or IDs; the first character says which
+    # regexes are worth running at all
+    c0 = line[0]
+    if c0 in _GARBAGE_FIRST_CHARS:
+        if _TIP_RE.match(line): return "GARBAGE", None
+        if _FCODE_RE.match(line): return "GARBAGE", None
+        if line.startswith("Words to Use") or line == "基本": return "GARBAGE", None
+        if _CHAPTER_RE.match(line): return "GARBAGE", None
 
-    # ID Only
-    if re.match(r'^(\d+(?:-\d+)?)$', line) or re.match(r'^(-\d+)(?:＝)?$', line):
-        return "ID_ONLY", line.split('＝')[0]
+    if c0.isdecimal() or c0 == '-':
+        m = _ID_LINE_RE.match(line)
+        if m:
+            rest = m.group('rest')
+            # ID Only
+            if rest is None:
+                return "ID_ONLY", m.group('sub') or m.group('id')
 
-    # ID + Japanese
-    match_id_jp = re.match(r'^(\d+(?:-\d+)?)\s+([^a-zA-Z].*)$', line)
-    if match_id_jp and is_japanese(match_id_jp.group(2)):
-        return "ID_JAPANESE", (match_id_jp.group(1), match_id_jp.group(2))
-
-    # ID + English (Answer Line)
-    match_id_en = re.match(r'^(\d+(?:-\d+)?)\s+([a-zA-Z"\'].*)$', line)
-    if match_id_en:
-        return "ID_ENGLISH", (match_id_en.group(1), match_id_en.group(2))
+            item_id = m.group('id')
+            c = rest[0]
+            # ID + English (Answer Line)
+            if c.isascii() and c.isalpha():
+                return "ID_ENGLISH", (item_id, rest)
+            # ID + Japanese
+            if is_japanese(rest):
+                return "ID_JAPANESE", (item_id, rest)
+            # A quote can open either; without Japanese it's the answer line
+            if c in "\"'":
+                return "ID_ENGLISH", (item_id, rest)
 
     # Question Detection
     # 1. Contains blanks
-    if re.search(r'[\(（].*?[\)）]', line): 
+    if _BLANK_RE.search(line): 
         return "QUESTION_LINE", line
     
     # 2. Japanese
@@ -128,12 +211,49 @@ def classify_line(line):
     # 3. English Text (Potential Question part or Explanation)
     return "ENGLISH_TEXT", line
 
+def build_final_item(item, _find=find_answer_part, _nl_join="\n".join, _sp_join=" ".join):
+    """Turn a parsed item into the app's record; the joins are bound as defaults
+    since this runs once per item."""
+    q = _sp_join(item['question'])
+    f = item['en_full']
+    
+    # Heuristic: If Q is empty but we have Full Sentence, try to guess unique blanks?
+    # NO, user wants to see blanks.
+    # If Q is empty, maybe English Buffer was the question?
+    # We handled english_buffer above.
+    
+    # If Q still empty, use a placeholder
+    if not q:
+        ans = "???"
+        en = f
+    else:
+        found = _find(q, f)
+        if not found or not found[0]:
+            # If finding answer failed, maybe Q has no blanks?
+            # or formatting issue.
+            ans = f
+            en = f
+        else:
+            # Wrap only the located span; replace() would also wrap any
+            # other occurrence of a short answer like "to"
+            ans, ans_start, ans_end = found
+            en = f"{f[:ans_start]}{{{ans}}}{f[ans_end:]}"
+    
+    return {
+        'id': item['id'],
+        'ja': _sp_join(item['ja']).strip(),
+        'en': en,
+        'answer': ans,
+        'explanation': _nl_join(item['expl']).strip()
+    }
+
 def parse_lines_v3(text):
     lines = text.split('\n')
     items = []
     current_item = None
     japanese_buffer = [] 
     english_buffer = [] # Buffer for multi-line English/Questions
+    # An item's 'ja' and 'question' are lists of lines, joined once at the end
     
     for line in lines:
         kind, data = classify_line(line)
@@ -152,21 +272,20 @@ def parse_lines_v3(text):
                         base_id = prev_id.split('-')[0]
                         raw_id = f"{base_id}{raw_id}"
             
-            current_item = {'id': raw_id, 'ja': '', 'en_full':'', 'question':'', 'expl': []}
+            current_item = {'id': raw_id, 'ja': [], 'en_full':'', 'question': [], 'expl': []}
             if japanese_buffer:
-                 current_item['ja'] = " ".join(japanese_buffer)
+                 current_item['ja'] = japanese_buffer
                  japanese_buffer = []
 
         elif kind == "ID_JAPANESE":
             if current_item: items.append(current_item)
-            current_item = {'id': data[0], 'ja': data[1], 'en_full':'', 'question':'', 'expl': []}
-            if japanese_buffer:
-                current_item['ja'] = " ".join(japanese_buffer) + " " + current_item['ja']
-                japanese_buffer = []
+            current_item = {'id': data[0], 'ja': japanese_buffer, 'en_full':'', 'question': [], 'expl': []}
+            current_item['ja'].append(data[1])
+            japanese_buffer = []
 
         elif kind == "JAPANESE_LINE":
             if current_item and not current_item['question'] and not current_item['en_full']:
-                current_item['ja'] += (" " + data if current_item['ja'] else data)
+                current_item['ja'].append(data)
             elif current_item and current_item['en_full']:
                 current_item['expl'].append(data)
             else:
@@ -176,21 +295,19 @@ def parse_lines_v3(text):
         elif kind == "QUESTION_LINE":
             if current_item and current_item['en_full']:
                 if current_item: items.append(current_item)
-                ja_text = " ".join(japanese_buffer)
-                current_item = {'id': 'PENDING', 'ja': ja_text, 'en_full':'', 'question': data, 'expl': []}
+                current_item = {'id': 'PENDING', 'ja': japanese_buffer, 'en_full':'', 'question': [data], 'expl': []}
                 japanese_buffer = []
             
             elif current_item:
                 if current_item['question']:
-                     current_item['question'] += " " + data
+                     current_item['question'].append(data)
                 else:
-                    current_item['question'] = data
+                    current_item['question'] = [data]
                     if not current_item['ja'] and japanese_buffer:
-                        current_item['ja'] = " ".join(japanese_buffer)
+                        current_item['ja'] = japanese_buffer
                         japanese_buffer = []
             else:
-                ja_text = " ".join(japanese_buffer)
-                current_item = {'id': 'PENDING', 'ja': ja_text, 'en_full':'', 'question': data, 'expl': []}
+                current_item = {'id': 'PENDING', 'ja': japanese_buffer, 'en_full':'', 'question': [data], 'expl': []}
                 japanese_buffer = []
 
         elif kind == "ID_ENGLISH":
@@ -200,21 +317,19 @@ def parse_lines_v3(text):
                 current_item['en_full'] = text
                 # Also, if we have english_buffer, maybe it was the Question?
                 if english_buffer and not current_item['question']:
-                     current_item['question'] = " ".join(english_buffer)
+                     current_item['question'] = english_buffer
                      english_buffer = []
                 
             elif current_item and current_item['id'] == 'PENDING':
                 current_item['id'] = new_id
                 current_item['en_full'] = text
                 if english_buffer and not current_item['question']:
-                     current_item['question'] = " ".join(english_buffer)
+                     current_item['question'] = english_buffer
                      english_buffer = []
                 
             else:
                 if current_item: items.append(current_item)
-                ja_text = " ".join(japanese_buffer)
-                q_text = " ".join(english_buffer) if english_buffer else ''
-                current_item = {'id': new_id, 'ja': ja_text, 'en_full': text, 'question': q_text, 'expl': []}
+                current_item = {'id': new_id, 'ja': japanese_buffer, 'en_full': text, 'question': english_buffer, 'expl': []}
                 japanese_buffer = []
                 english_buffer = []
 
@@ -227,7 +342,7 @@ def parse_lines_v3(text):
             else:
                  # It might be a broken Question line OR valid Question without blanks
                  if current_item and current_item['question']:
-                      current_item['question'] += " " + data
+                      current_item['question'].append(data)
                  elif current_item:
                       english_buffer.append(data)
                  else:
@@ -237,63 +352,23 @@ def parse_lines_v3(text):
     if current_item:
         items.append(current_item)
 
-    final_items = []
-    for item in items:
-        # Filter Pending
-        if not item['id'] or item['id'] == 'PENDING': continue
-        if not item['en_full']: continue 
-        
-        q = item['question']
-        f = item['en_full']
-        
-        # Heuristic: If Q is empty but we have Full Sentence, try to guess unique blanks?
-        # NO, user wants to see blanks.
-        # If Q is empty, maybe English Buffer was the question?
-        # We handled english_buffer above.
-        
-        # If Q still empty, use a placeholder
-        if not q:
-            ans = "???"
-            item['en'] = f
-        else:
-            ans = find_answer_part(q, f)
-            if not ans:
-                # If finding answer failed, maybe Q has no blanks?
-                # or formatting issue.
-                ans = f
-                item['en'] = f
-            else:
-                item['en'] = f.replace(ans, f"{{{ans}}}")
-        
-        item['answer'] = ans 
-        item['explanation'] = "\n".join(item['expl']).strip()
-        item['ja'] = item['ja'].strip()
-        
-        final_items.append({
-            'id': item['id'],
-            'ja': item['ja'],
-            'en': item['en'],
-            'answer': item.get('answer', '???'),
-            'explanation': item['explanation']
-        })
-        
-    return final_items
+    # Filter Pending / sentence-less items and build the output in one pass
+    return [build_final_item(item) for item in items
+            if item['id'] and item['id'] != 'PENDING' and item['en_full']]
 
-def generate_app(chapter_num, items):
+def load_template():
+    """Read template.html and swap the per-chapter parts for sentinels."""
     if not TEMPLATE_FILE.exists():
          return ""
     with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
         template = f.read()
     
-    chapter_title_text = f"Chapter {chapter_num}"
-    template = re.sub(r'<title>.*?</title>', f'<title>Insight App - {chapter_title_text}</title>', template)
-    template = re.sub(
-        r'<h2 id="app-subtitle"([^>]*)>.*?</h2>', 
-        f'<h2 id="app-subtitle"\\1>学習用サイト（{chapter_title_text}）</h2>', 
+    template = _TITLE_RE.sub(f'<title>Insight App - {CHAPTER_SENTINEL}</title>', template)
+    template = _SUBTITLE_RE.sub(
+        f'<h2 id="app-subtitle"\\1>学習用サイト（{CHAPTER_SENTINEL}）</h2>', 
         template
     )
     
-    json_data = json.dumps(items, ensure_ascii=False, indent=4)
     start_marker = "const chapterData = ["
     end_marker = "];"
     
@@ -301,17 +376,72 @@ def generate_app(chapter_num, items):
     if start_idx != -1:
          end_idx = template.find(end_marker, start_idx)
          if end_idx != -1:
-             new_code = f"const chapterData = {json_data};"
+             new_code = f"const chapterData = {DATA_SENTINEL};"
              template = template[:start_idx] + new_code + template[end_idx+2:]
     
     return template
 
+def dump_chapter_data(items):
+    # The array is inlined into a <script>, so compact output is enough
+    if orjson is not None:
+        return orjson.dumps(items).decode("utf-8")
+    return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+
+def generate_app(chapter_num, items, template=None):
+    # template is the sentinel form from load_template(), read once in main
+    if template is None:
+        template = load_template()
+    if not template:
+         return ""
+    
+    chapter_title_text = f"Chapter {chapter_num}"
+    json_data = dump_chapter_data(items)
+    # Chapter first, so the (large) JSON is never rescanned
+    return template.replace(CHAPTER_SENTINEL, chapter_title_text).replace(DATA_SENTINEL, json_data)
+
 def get_chapter_number(filename):
     normalized = unicodedata.normalize('NFKC', filename)
-    match = re.search(r'(\d+)', normalized)
-    if match: return int(match.group(1))
+    match = _NUM_RE.search(normalized)
+    if match: return int(match.group())
     return 999
 
+def load_items(pdf_file):
+    """Extract and parse a PDF, reusing the items from an earlier run when nothing changed."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(pdf_file, "rb") as fh:
+        # Fixed-size reads, so a large PDF is never held in memory just to hash it
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    h.update(_PARSER_DIGEST)
+    cache_file = ITEMS_CACHE_DIR / f"items-{h.hexdigest()}.json"
+    if cache_file.exists():
+        return json.loads(cache_file.read_text(encoding="utf-8"))
+
+    raw_text = extract_text_pypdf(pdf_file)
+    items = parse_lines_v3(raw_text)
+    if raw_text:
+        if not ITEMS_CACHE_DIR.exists():
+            ITEMS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Keep the cache out of the 'git add .' deploy commit
+            (ITEMS_CACHE_DIR / ".gitignore").write_text("*\n", encoding="utf-8")
+        cache_file.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    return items
+
+def process_pdf(pdf_file, template):
+    print(f"Processing {pdf_file.name}...")
+    items = load_items(pdf_file)
+    print(f"Extracted {len(items)} items.")
+    
+    chap_num = get_chapter_number(pdf_file.name)
+    html_content = generate_app(chap_num, items, template)
+    
+    output_name = f"chapter-{chap_num:02d}.html"
+    return output_name, f"Chapter {chap_num}", html_content
+
+def write_page(output_path, html_content):
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+
 def main():
     print("--- Insight App Generator V3.3 (Max Robust) ---")
     setup_directories()
@@ -319,56 +449,43 @@ def main():
     files = list(PDF_DIR.glob("*.pdf"))
     files.sort(key=lambda x: get_chapter_number(x.name))
     
-    generated_links = []
+    template = load_template()
     
-    for pdf_file in files:
-        print(f"Processing {pdf_file.name}...")
-        raw_text = extract_text_pypdf(pdf_file)
-        items = parse_lines_v3(raw_text)
-        print(f"Extracted {len(items)} items.")
-        
-        chap_num = get_chapter_number(pdf_file.name)
-        html_content = generate_app(chap_num, items)
-        
-        output_name = f"chapter-{chap_num:02d}.html"
-        output_path = DOCS_DIR / output_name
-        
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        generated_links.append((output_name, f"Chapter {chap_num}"))
+    # Each PDF is independent: extract + parse + render in worker processes,
+    # then write the pages from here in chapter order.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(process_pdf, files, repeat(template)))
+    
+    # Every chapter has its own file, so the writes can overlap; list() makes
+    # a failed write raise here
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write_page,
+                          [DOCS_DIR / output_name for output_name, _, _ in results],
+                          [html_content for _, _, html_content in results]))
+    generated_links = [(output_name, title) for output_name, title, _ in results]
 
     print("Updating Index...")
     index_path = DOCS_DIR / "index.html"
-    list_items = ""
-    for fname, title in generated_links:
-        list_items += f'<li class="mb-2"><a href="{fname}" class="text-blue-600 hover:underline">{title}</a></li>'
-    
-    index_html = f"""
-    <!DOCTYPE html>
-    <html lang="ja">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Insight English Apps Index</title>
-        <script src="https://cdn.tailwindcss.com"></script>
-    </head>
-    <body class="bg-gray-100 p-8">
-        <div class="max-w-xxl mx-auto bg-white p-8 rounded shadow">
-            <h1 class="text-3xl font-bold mb-6">Insight English Apps</h1>
-            <ul class="list-disc pl-5">
-                {list_items}
-            </ul>
-        </div>
-    </body>
-    </html>
-    """
+    list_items = "".join(
+        f'<li class="mb-2"><a href="{fname}" class="text-blue-600 hover:underline">{title}</a></li>'
+        for fname, title in generated_links
+    )
+    index_html = INDEX_TEMPLATE.format(list_items=list_items)
     with open(index_path, "w", encoding="utf-8") as f:
         f.write(index_html)
 
     print("Deploying...")
-    run_command("git add .")
-    run_command('git commit -m "Update parsing logic V3.3 (Max Robust)"', cwd=os.getcwd())
-    run_command("git push origin main", cwd=os.getcwd())
+    run_command(["git", "add", "."])
+    # Empty output means nothing is staged: the pages came out identical.
+    # None means git itself failed (e.g. not a repo), so don't commit or push.
+    staged = run_command(["git", "diff", "--cached", "--name-only"])
+    if staged is None:
+        return
+    if not staged:
+        print("No changes to deploy.")
+        return
+    run_command(["git", "commit", "-m", "Update parsing logic V3.3 (Max Robust)"])
+    run_command(["git", "push", "origin", "main"])
 
 if __name__ == "__main__":
     main()
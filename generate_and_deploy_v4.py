@@ -1,105 +1,182 @@
 
 # V4.1: Enhanced V2 extracting with "Look Back" for Japanese
+import argparse
 import os
 import re
 import sys
 import json
 import subprocess
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
 from pathlib import Path
-from pypdf import PdfReader
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration
 PDF_DIR = Path("pdfs")
 DOCS_DIR = Path("docs")
 TEMPLATE_FILE = Path("template.html")
 
+# Compiled once instead of going through re's pattern cache for every item
+_WS_RE = re.compile(r'\s+')
+# Hiragana/Katakana, CJK Extension A, CJK Unified Ideographs, CJK Compatibility
+# Ideographs, Halfwidth Katakana, CJK Extensions B-H
+_JA_CHAR_RE = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+    r'\U00020000-\U000323af]'
+)
+# ID at the start of a line ("1056", "1-1", "1056 The train..."); group 2 is the rest
+_ID_RE = re.compile(r'(\d+(?:-\d+)?)(.*)')
+_FCODE_RE = re.compile(r'F\s*\d+')
+_TITLE_RE = re.compile(r'<title>.*?</title>')
+_SUBTITLE_RE = re.compile(r'<h2 id="app-subtitle"([^>]*)>.*?</h2>')
+_NUM_RE = re.compile(r'\d+')
+
+# Marker strings the parser compares against, bound once
+_UNKNOWN = "???"
+_KIHON = "基本"
+_WORDS_TO_USE = "Words to Use"
+_TIP = "Tip"
+
+# Parser states; small ints compare faster than the old state strings
+FIND_ID, JAPANESE, WAITING_FOR_FULL_SENTENCE, POST_ID_SEARCH, EXPLANATION = range(5)
+
+# Placeholders load_template() leaves in the cached template
+CHAPTER_SENTINEL = "{{CHAPTER}}"
+DATA_SENTINEL = "{{DATA}}"
+
 def run_command(command, cwd=None):
+    # command is an argv list; running git directly avoids spawning /bin/sh
     try:
         result = subprocess.run(
             command,
             cwd=cwd,
-            shell=True,
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            capture_output=True,
+            text=True,
+            close_fds=False
         )
         return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}")
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error running command: {' '.join(command)}")
         return None
 
 def setup_directories():
     if not DOCS_DIR.exists():
         DOCS_DIR.mkdir()
 
+def extract_text_pymupdf(pdf_path):
+    if pymupdf is None:
+        print("PyMuPDF is not installed, falling back to pypdf")
+        return extract_text_pypdf(pdf_path)
+    try:
+        doc = pymupdf.open(pdf_path)
+        try:
+            return "\n".join(page.get_text("text") for page in doc)
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"PyMuPDF could not read {pdf_path}, falling back to pypdf: {e}")
+        return extract_text_pypdf(pdf_path)
+
 def extract_text_pypdf(pdf_path):
     try:
+        # Imported here so the pymupdf backend doesn't pay pypdf's ~80 ms import
+        from pypdf import PdfReader
         reader = PdfReader(pdf_path)
-        text = ""
+        parts = []
         for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+            # "plain" skips the layout-mode positioning pass
+            parts.append(page.extract_text(extraction_mode="plain"))
+            parts.append("\n")
+        return "".join(parts)
     except Exception as e:
         print(f"Error reading {pdf_path}: {e}")
         return ""
 
+# --backend choices. The parser below was tuned on pypdf's line layout, so
+# PyMuPDF is faster but loses items and leaves ligatures in the answers.
+EXTRACTORS = {
+    "pypdf": extract_text_pypdf,
+    "pymupdf": extract_text_pymupdf,
+}
+
 def is_japanese(text):
-    for char in text:
-        try:
-            name = unicodedata.name(char, "")
-            if "HIRAGANA" in name or "KATAKANA" in name or "CJK" in name:
-                return True
-        except:
-             pass
-    return False
+    # ASCII-only strings (most English lines) are flagged as such by CPython
+    if text.isascii():
+        return False
+    # The character-class scan runs in C and stops at the first hit
+    return _JA_CHAR_RE.search(text) is not None
+
+def find_spaced(f, text, last=False):
+    """(start, end) of the first (or last) occurrence of text in f, letting each
+    space in text match a run of whitespace in f; None when it isn't there."""
+    i = f.rfind(text) if last else f.find(text)
+    if i != -1:
+        return i, i + len(text)
+    # Rare: f has a double space or a line break inside the match
+    m = None
+    for m in re.finditer(r'\s+'.join(map(re.escape, text.split())), f):
+        if not last:
+            break
+    return m.span() if m else None
 
 def find_answer_part(question, full_sentence):
-    q = re.sub(r'\s+', ' ', question).strip()
-    f = re.sub(r'\s+', ' ', full_sentence).strip()
+    q = _WS_RE.sub(' ', question).strip()
+    # Spans are measured on the sentence as given, so the caller can splice it
+    f = full_sentence
     
-    start_match = re.search(r'[\(（]', q)
-    end_match = re.search(r'[\)）][^\)）]*$', q)
+    # First opening and last closing paren (ASCII or full-width) bound the blanks
+    open_idx = q.find('(')
+    wide_open_idx = q.find('（')
+    if open_idx == -1 or (wide_open_idx != -1 and wide_open_idx < open_idx):
+        open_idx = wide_open_idx
     
-    if not start_match:
+    if open_idx == -1:
         return None
         
-    prefix = q[:start_match.start()].strip()
+    prefix = q[:open_idx].strip()
     suffix = ""
-    if end_match:
-        last_paren_index = -1
-        for i, char in enumerate(q):
-            if char in [')', '）']:
-                last_paren_index = i
-        if last_paren_index != -1:
-             suffix = q[last_paren_index+1:].strip()
+    last_paren_index = max(q.rfind(')'), q.rfind('）'))
+    if last_paren_index != -1:
+         suffix = q[last_paren_index+1:].strip()
 
     start_idx = 0
     if prefix:
-        try:
-             start_idx = f.index(prefix) + len(prefix)
-        except ValueError:
-             pass
+        found = find_spaced(f, prefix)
+        if found:
+            start_idx = found[1]
     
     end_idx = len(f)
     if suffix:
-        try:
-             found = f.rfind(suffix)
-             if found != -1:
-                 end_idx = found
-        except ValueError:
-             pass
+        found = find_spaced(f, suffix, last=True)
+        if found:
+            end_idx = found[0]
              
-    answer = f[start_idx:end_idx].strip()
-    return answer
+    # Strip the span in place so the indices still point into full_sentence;
+    # the answer itself keeps its whitespace runs collapsed, as before
+    span = f[start_idx:end_idx]
+    stripped = span.strip()
+    start_idx += len(span) - len(span.lstrip())
+    return _WS_RE.sub(' ', stripped), start_idx, start_idx + len(stripped)
 
 def parse_chapter_text(text):
     lines = text.split('\n')
     items = []
     
     current_item = {}
-    state = "FIND_ID" 
+    state = FIND_ID
     
     # Buffer for lines that appear before an ID
     pre_id_buffer = []
@@ -108,13 +185,16 @@ def parse_chapter_text(text):
         if current_item.get('id') and current_item.get('en_full'):
             q = current_item.get('question', '')
             f = current_item.get('en_full', '')
-            ans = find_answer_part(q, f)
+            found = find_answer_part(q, f)
             
-            if ans and ans in f:
+            if found and found[0]:
+                # Wrap only the located span; replace() would also wrap any
+                # other occurrence of a short answer like "to"
+                ans, ans_start, ans_end = found
                 current_item['answer'] = ans
-                current_item['en'] = f.replace(ans, f"{{{ans}}}")
+                current_item['en'] = f"{f[:ans_start]}{{{ans}}}{f[ans_end:]}"
             else:
-                 current_item['answer'] = "???"
+                 current_item['answer'] = _UNKNOWN
                  current_item['en'] = f
             
             expl = "\n".join(current_item.get('explanation_lines', [])).strip()
@@ -125,16 +205,28 @@ def parse_chapter_text(text):
                  # Check if buffer has Japanese
                  ja_lines = [l for l in pre_id_buffer if is_japanese(l)]
                  if ja_lines:
-                     current_item['ja'] = " ".join(ja_lines)
+                     current_item['ja'] = ja_lines
+            current_item['ja'] = " ".join(current_item['ja'])
 
-            cleanup = {k:v for k,v in current_item.items() if k in ['id', 'ja', 'en', 'answer', 'explanation']}
-            items.append(cleanup)
+            # Named fields, in the order the old key filter produced them
+            items.append({
+                'id': current_item['id'],
+                'ja': current_item['ja'],
+                'answer': current_item['answer'],
+                'en': current_item['en'],
+                'explanation': current_item['explanation']
+            })
 
-    for i, line in enumerate(lines):
+    # Bound once; attribute lookups on the patterns add up over every line
+    match_id = _ID_RE.match
+    match_fcode = _FCODE_RE.match
+    
+    for line in lines:
         line = line.strip()
         if not line: continue
         
-        id_match = re.match(r'^(\d+(-\d+)?)(.*)$', line)
+        # Only lines starting with a digit can be IDs; skip the regex otherwise
+        id_match = match_id(line) if line[0].isdecimal() else None
         
         # Check if line identifies as strict ID start
         is_id_line = False
@@ -143,13 +235,13 @@ def parse_chapter_text(text):
              # e.g. "2024 is..."
              # Heuristic: ID must be small number or ID format
              matched_id = id_match.group(1).strip()
-             rest = id_match.group(3).strip()
+             rest = id_match.group(2).strip()
              if len(matched_id) < 6: # IDs are usually small
                   is_id_line = True
         
         if is_id_line:
             matched_id = id_match.group(1).strip()
-            rest = id_match.group(3).strip()
+            rest = id_match.group(2).strip()
             
             # Transition Logic
             is_repeated_id = False
@@ -160,11 +252,11 @@ def parse_chapter_text(text):
                  # It's the Answer line!
                 if len(rest) > 5 and not is_japanese(rest):
                     current_item['en_full'] = rest
-                    state = "EXPLANATION"
+                    state = EXPLANATION
                     pre_id_buffer = [] # Clear buffer
                     continue
                 else:
-                    state = "POST_ID_SEARCH"
+                    state = POST_ID_SEARCH
                     pre_id_buffer = []
                     continue
             
@@ -175,19 +267,19 @@ def parse_chapter_text(text):
             current_item = {
                 'id': matched_id,
                 'explanation_lines': [],
-                'ja': '',
+                'ja': [], # joined once in save_current
                 'question': ''
             }
             
             # Retroactively check buffer for Japanese!
             if pre_id_buffer:
-                 ja_candidates = [l for l in pre_id_buffer if is_japanese(l) and not l.startswith("Tip")]
+                 ja_candidates = [l for l in pre_id_buffer if is_japanese(l) and not l.startswith(_TIP)]
                  # Take the last relevant Japanese lines?
                  if ja_candidates:
-                      current_item['ja'] = " ".join(ja_candidates)
+                      current_item['ja'] = ja_candidates
                  pre_id_buffer = []
 
-            state = "JAPANESE"
+            state = JAPANESE
             continue
             
         # Not an ID line
@@ -195,19 +287,16 @@ def parse_chapter_text(text):
              pre_id_buffer.append(line)
              continue
         
-        if state == "JAPANESE":
-            if line.startswith("Words to Use") or line == "基本":
+        if state == JAPANESE:
+            if line.startswith(_WORDS_TO_USE) or line == _KIHON:
                 continue
             
             if is_japanese(line):
-                if current_item['ja']:
-                     current_item['ja'] += " " + line
-                else:
-                     current_item['ja'] = line
+                current_item['ja'].append(line)
             
             elif '(' in line or '（' in line:
                 current_item['question'] = line
-                state = "WAITING_FOR_FULL_SENTENCE"
+                state = WAITING_FOR_FULL_SENTENCE
             else:
                 # English text appearing here might be Question without blanks?
                 # Or garbage.
@@ -215,22 +304,22 @@ def parse_chapter_text(text):
                 pre_id_buffer.append(line) # Keep in buffer just in case
                 pass
 
-        elif state == "WAITING_FOR_FULL_SENTENCE":
+        elif state == WAITING_FOR_FULL_SENTENCE:
             pre_id_buffer.append(line) # Buffer lines between Question and Answer ID
             pass
 
-        elif state == "POST_ID_SEARCH":
-            if re.match(r'^F\s*\d+', line) or line.startswith("Tip"):
+        elif state == POST_ID_SEARCH:
+            if match_fcode(line) or line.startswith(_TIP):
                 continue
             if is_japanese(line):
                  pre_id_buffer.append(line) # Weird to see JA here
                  continue
             if len(line) > 2:
                 current_item['en_full'] = line
-                state = "EXPLANATION"
+                state = EXPLANATION
         
-        elif state == "EXPLANATION":
-             if line == "Words to Use": 
+        elif state == EXPLANATION:
+             if line == _WORDS_TO_USE: 
                   pre_id_buffer = []
                   continue
              current_item['explanation_lines'].append(line)
@@ -242,21 +331,24 @@ def parse_chapter_text(text):
         
     return items
 
-def generate_app(chapter_num, items):
+_TEMPLATE = None
+
+def load_template():
+    """Read template.html once and swap the per-chapter parts for sentinels."""
+    global _TEMPLATE
+    if _TEMPLATE is not None:
+        return _TEMPLATE
     if not TEMPLATE_FILE.exists():
          return ""
     with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
         template = f.read()
     
-    chapter_title_text = f"Chapter {chapter_num}"
-    template = re.sub(r'<title>.*?</title>', f'<title>Insight App - {chapter_title_text}</title>', template)
-    template = re.sub(
-        r'<h2 id="app-subtitle"([^>]*)>.*?</h2>', 
-        f'<h2 id="app-subtitle"\\1>学習用サイト（{chapter_title_text}）</h2>', 
+    template = _TITLE_RE.sub(f'<title>Insight App - {CHAPTER_SENTINEL}</title>', template)
+    template = _SUBTITLE_RE.sub(
+        f'<h2 id="app-subtitle"\\1>学習用サイト（{CHAPTER_SENTINEL}）</h2>', 
         template
     )
     
-    json_data = json.dumps(items, ensure_ascii=False, indent=4)
     start_marker = "const chapterData = ["
     end_marker = "];"
     
@@ -264,48 +356,87 @@ def generate_app(chapter_num, items):
     if start_idx != -1:
          end_idx = template.find(end_marker, start_idx)
          if end_idx != -1:
-             new_code = f"const chapterData = {json_data};"
+             new_code = f"const chapterData = {DATA_SENTINEL};"
              template = template[:start_idx] + new_code + template[end_idx+2:]
     
+    _TEMPLATE = template
     return template
 
+def dump_chapter_data(items):
+    # The array is inlined into a <script>, so compact output is enough
+    if orjson is not None:
+        return orjson.dumps(items).decode("utf-8")
+    return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+
+def generate_app(chapter_num, items, template=None):
+    # template is the sentinel form from load_template()
+    if template is None:
+        template = load_template()
+    if not template:
+         return ""
+    
+    chapter_title_text = f"Chapter {chapter_num}"
+    json_data = dump_chapter_data(items)
+    # Chapter first, so the (large) JSON is never rescanned
+    return template.replace(CHAPTER_SENTINEL, chapter_title_text).replace(DATA_SENTINEL, json_data)
+
+@lru_cache(maxsize=None)
 def get_chapter_number(filename):
     normalized = unicodedata.normalize('NFKC', filename)
-    match = re.search(r'(\d+)', normalized)
-    if match: return int(match.group(1))
+    match = _NUM_RE.search(normalized)
+    if match: return int(match.group())
     return 999
 
-def main():
+def process_pdf(pdf_file, chap_num, template, backend="pypdf"):
+    print(f"Processing {pdf_file.name}...")
+    raw_text = EXTRACTORS[backend](pdf_file)
+    
+    items = parse_chapter_text(raw_text)
+    print(f"Extracted {len(items)} items.")
+    
+    html_content = generate_app(chap_num, items, template)
+    
+    output_name = f"chapter-{chap_num:02d}.html"
+    return output_name, f"Chapter {chap_num}", html_content
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the chapter apps from pdfs/ and deploy them.")
+    parser.add_argument("--backend", choices=sorted(EXTRACTORS), default="pypdf",
+                        help="PDF text extractor (default: pypdf)")
+    args = parser.parse_args(argv)
+    
     print("--- Insight App Generator V4.1 (Retroactive JA) ---")
     setup_directories()
     
-    files = list(PDF_DIR.glob("*.pdf"))
-    files.sort(key=lambda x: get_chapter_number(x.name))
+    # Decorate-sort-undecorate: the numbers are worked out once, here, and
+    # handed to the workers along with the files
+    decorated = [(get_chapter_number(p.name), p) for p in PDF_DIR.glob("*.pdf")]
+    decorated.sort(key=itemgetter(0))
+    files = [p for _, p in decorated]
+    chapter_ids = [num for num, _ in decorated]
     
     generated_links = []
+    # Read once here and hand the text to the workers
+    template = load_template()
     
-    for pdf_file in files:
-        print(f"Processing {pdf_file.name}...")
-        raw_text = extract_text_pypdf(pdf_file)
-        
-        items = parse_chapter_text(raw_text)
-        print(f"Extracted {len(items)} items.")
-        
-        chap_num = get_chapter_number(pdf_file.name)
-        html_content = generate_app(chap_num, items)
-        
-        output_name = f"chapter-{chap_num:02d}.html"
+    # Each PDF is independent: extract + parse + render in worker processes,
+    # then write the pages from here in chapter order.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(process_pdf, files, chapter_ids, repeat(template), repeat(args.backend)))
+    
+    for output_name, title, html_content in results:
         output_path = DOCS_DIR / output_name
         
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        generated_links.append((output_name, f"Chapter {chap_num}"))
+        # Encoded once and written in a single call, no text-layer wrapper
+        output_path.write_bytes(html_content.encode("utf-8"))
+        generated_links.append((output_name, title))
 
     print("Updating Index...")
     index_path = DOCS_DIR / "index.html"
-    list_items = ""
-    for fname, title in generated_links:
-        list_items += f'<li class="mb-2"><a href="{fname}" class="text-blue-600 hover:underline">{title}</a></li>'
+    list_items = "".join(
+        f'<li class="mb-2"><a href="{fname}" class="text-blue-600 hover:underline">{title}</a></li>'
+        for fname, title in generated_links
+    )
     
     index_html = f"""
     <!DOCTYPE html>
@@ -326,13 +457,14 @@ def main():
     </body>
     </html>
     """
-    with open(index_path, "w", encoding="utf-8") as f:
-        f.write(index_html)
+    index_path.write_bytes(index_html.encode("utf-8"))
 
     print("Deploying...")
-    run_command("git add .")
-    run_command('git commit -m "Update parsing V4.1 with Retroactive Japanese detection"', cwd=os.getcwd())
-    run_command("git push origin main", cwd=os.getcwd())
+    # 'git add .' stays separate: 'commit -a' would miss newly generated pages
+    # Chained like 'add && commit && push': run_command returns None on failure
+    if (run_command(["git", "add", "."]) is not None
+            and run_command(["git", "commit", "-m", "Update parsing V4.1 with Retroactive Japanese detection"]) is not None):
+        run_command(["git", "push", "origin", "main"])
 
 if __name__ == "__main__":
     main()
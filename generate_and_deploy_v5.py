@@ -6,244 +6,342 @@ import sys
 import json
 import subprocess
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby, repeat
+from operator import itemgetter
 from pathlib import Path
 from pypdf import PdfReader
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration
 PDF_DIR = Path("pdfs")
 DOCS_DIR = Path("docs")
 TEMPLATE_FILE = Path("template.html")
 
+# Compiled once instead of going through re's pattern cache for every line/item
+_WS_RE = re.compile(r'\s+')
+# Hiragana/Katakana, CJK Extension A, CJK Unified Ideographs, CJK Compatibility
+# Ideographs, Halfwidth Katakana, CJK Extensions B-H
+_JA_CHAR_RE = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+    r'\U00020000-\U000323af]'
+)
+_FCODE_RE = re.compile(r'^F\s+\d+$')
+# ID at the start of a line ("1056", "1-1", "1056 The train..."); group 2 is the rest
+_ID_RE = re.compile(r'^(\d+(?:-\d+)?)(?:\s+(.*))?$')
+_DIGITS_RE = re.compile(r'^\d+$')
+_TITLE_RE = re.compile(r'<title>.*?</title>')
+_SUBTITLE_RE = re.compile(r'<h2 id="app-subtitle"([^>]*)>.*?</h2>')
+_NUM_RE = re.compile(r'\d+')
+
+# Marker strings the parser compares against, bound once
+_UNKNOWN = "???"
+_KIHON = "基本"
+_WORDS_TO_USE = "Words to Use"
+_TIP = "Tip"
+
+# Placeholders load_template() leaves in the template
+CHAPTER_SENTINEL = "{{CHAPTER}}"
+DATA_SENTINEL = "{{DATA}}"
+
 def run_command(command, cwd=None):
+    # command is an argv list; running git directly avoids spawning /bin/sh
     try:
         result = subprocess.run(
             command,
             cwd=cwd,
-            shell=True,
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            capture_output=True,
+            text=True,
+            close_fds=False
         )
         return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}")
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error running command: {' '.join(command)}")
         return None
 
 def setup_directories():
     if not DOCS_DIR.exists():
         DOCS_DIR.mkdir()
 
-def extract_text_pypdf(pdf_path):
+def iter_lines_pypdf(pdf_path):
+    # One page in memory at a time instead of the whole document's text
     try:
         reader = PdfReader(pdf_path)
-        text = ""
         for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+            yield from page.extract_text().split('\n')
     except Exception as e:
         print(f"Error reading {pdf_path}: {e}")
-        return ""
 
 def is_japanese(text):
-    for char in text:
-        try:
-            name = unicodedata.name(char, "")
-            if "HIRAGANA" in name or "KATAKANA" in name or "CJK" in name:
-                return True
-        except:
-             pass
-    return False
+    # ASCII-only strings (most English lines) are flagged as such by CPython
+    if text.isascii():
+        return False
+    # The character-class scan runs in C and stops at the first hit
+    return _JA_CHAR_RE.search(text) is not None
+
+def find_either(s, a, b, start=0):
+    # Index of the first a or b at/after start, or -1; two C-level finds
+    i = s.find(a, start)
+    j = s.find(b, start)
+    if i == -1 or (j != -1 and j < i):
+        return j
+    return i
+
+def find_spaced(f, text, start=0, last=False):
+    """(start, end) of the first (or last) occurrence of text in f[start:],
+    letting each space in text match a run of whitespace in f; None when it
+    isn't there."""
+    i = f.rfind(text, start) if last else f.find(text, start)
+    if i != -1:
+        return i, i + len(text)
+    # Rare: f has a double space or a line break inside the match
+    m = None
+    for m in re.compile(r'\s+'.join(map(re.escape, text.split()))).finditer(f, start):
+        if not last:
+            break
+    return m.span() if m else None
+
+def strip_span(f, start, end):
+    """(answer, start, end) for f[start:end]: the indices trimmed to the text
+    inside f, the answer with its whitespace runs collapsed as before; None
+    when nothing is left."""
+    span = f[start:end]
+    stripped = span.strip()
+    if not stripped:
+        return None
+    start += len(span) - len(span.lstrip())
+    return _WS_RE.sub(' ', stripped), start, start + len(stripped)
 
 def find_answer_part(question, full_sentence):
+    """(answer, start, end), the span measured on full_sentence as given so the
+    caller can splice it; start/end are None when the answer isn't a run of the
+    sentence (parens taken out of the middle)."""
     # Normalize spaces
-    q = re.sub(r'\s+', ' ', question).strip()
-    f = re.sub(r'\s+', ' ', full_sentence).strip()
+    q = _WS_RE.sub(' ', question).strip()
+    f = full_sentence
     
     # 1. Try explicit blank detection ((...), (...), or underscores)
-    start_match = re.search(r'[\(（]', q)
-    if start_match:
-        prefix = q[:start_match.start()].strip()
-        rest = q[start_match.start():]
-        end_match = re.search(r'[\)）](.*)$', rest)
-        suffix = end_match.group(1).strip() if end_match else ""
+    open_idx = find_either(q, '(', '（')
+    if open_idx != -1:
+        prefix = q[:open_idx].strip()
+        # Whatever follows the first closing paren after the blank
+        close_idx = find_either(q, ')', '）', open_idx)
+        suffix = q[close_idx+1:].strip() if close_idx != -1 else ""
         
         # Use prefix/suffix to find middle
         start_idx = 0
         if prefix:
-            try: start_idx = f.index(prefix) + len(prefix)
-            except ValueError: pass
+            found = find_spaced(f, prefix)
+            if found: start_idx = found[1]
         
         end_idx = len(f)
         if suffix:
-            try:
-                 found = f.rfind(suffix)
-                 if found != -1: end_idx = found
-            except ValueError: pass
+            found = find_spaced(f, suffix, last=True)
+            if found: end_idx = found[0]
         
-        candidate = f[start_idx:end_idx].strip()
-        return candidate.replace('(', '').replace(')', '').strip()
+        candidate = strip_span(f, start_idx, end_idx)
+        if candidate is None:
+            return None
+        text, start_idx, end_idx = candidate
+        answer = text.replace('(', '').replace(')', '').strip()
+        if answer == text:
+            return candidate
+        if not answer:
+            return None
+        # Parens at the edges still leave a run of the sentence to wrap
+        found = find_spaced(f, answer, start_idx)
+        if found is None or found[1] > end_idx:
+            return answer, None, None
+        return (answer,) + found
 
-    underscore_match = re.search(r'_+', q)
-    if underscore_match:
-        prefix = q[:underscore_match.start()].strip()
-        suffix = q[underscore_match.end():].strip()
+    under_idx = q.find('_')
+    if under_idx != -1:
+        prefix = q[:under_idx].strip()
+        # lstrip skips the whole run of underscores in C
+        suffix = q[under_idx:].lstrip('_').strip()
         
         start_idx = 0
         if prefix:
-             try: start_idx = f.index(prefix) + len(prefix)
-             except ValueError: pass
+             found = find_spaced(f, prefix)
+             if found: start_idx = found[1]
         end_idx = len(f)
         if suffix:
-             try:
-                 found = f.rfind(suffix)
-                 if found != -1: end_idx = found
-             except ValueError: pass
+             found = find_spaced(f, suffix, last=True)
+             if found: end_idx = found[0]
         
-        return f[start_idx:end_idx].strip()
+        return strip_span(f, start_idx, end_idx)
 
     # 2. Diff-based fallback (Prefix/Suffix matching)
     # If q is "The woman some flowers." and f is "The woman is watering some flowers."
+    # Compared on the normalized sentence, then mapped back onto the raw one
+    fn = _WS_RE.sub(' ', f).strip()
     # Find longest common prefix
+    # zip() stops at the shorter string, and reversed() walks both ends
+    # without building reversed copies
     common_prefix_len = 0
-    min_len = min(len(q), len(f))
-    for i in range(min_len):
-        if q[i] == f[i]: common_prefix_len += 1
-        else: break
+    for a, b in zip(q, fn):
+        if a != b: break
+        common_prefix_len += 1
     
     # Check if prefix ended at a space or full (word boundary)
     # Ideal: q[:prefix] should be valid
     
     # Find longest common suffix
     common_suffix_len = 0
-    q_rev = q[::-1]
-    f_rev = f[::-1]
-    min_len = min(len(q), len(f))
-    for i in range(min_len):
-        if q_rev[i] == f_rev[i]: common_suffix_len += 1
-        else: break
+    for a, b in zip(reversed(q), reversed(fn)):
+        if a != b: break
+        common_suffix_len += 1
         
     if common_prefix_len > 0 or common_suffix_len > 0:
         # Detected diff
         # Check overlaps
-        if common_prefix_len + common_suffix_len < len(f):
+        if common_prefix_len + common_suffix_len < len(fn):
              # Extract middle
-             middle = f[common_prefix_len : len(f) - common_suffix_len]
-             return middle.strip()
+             middle = fn[common_prefix_len : len(fn) - common_suffix_len].strip()
+             if not middle:
+                 return None
+             start_idx = 0
+             head = fn[:common_prefix_len].strip()
+             if head:
+                 found = find_spaced(f, head)
+                 if found: start_idx = found[1]
+             found = find_spaced(f, middle, start_idx)
+             if found is None:
+                 return middle, None, None
+             return strip_span(f, *found)
              
     return None
 
 
 
-def parse_chapter_text_v5(text):
-    raw_lines = [l.strip() for l in text.split('\n')]
+def store_block(bid, lines, answers, questions, explanations):
+    """File one ID's block as an answer (with explanation) or a question."""
+    full_text = " ".join(lines)
     
-    # 1. Statefully collect blocks by ID
-    blocks = []
-    current_block = None
+    # Classification
+    # Answer Block signal: Contains "▶" (Explanation marker) OR is purely English without blanks
+    # Question Block signal: Contains "(___)", "基本", "Tip", or Japanese WITHOUT "▶"
     
-    for line in raw_lines:
+    is_answer_block = False
+    has_ja = False
+    if "▶" in full_text: 
+        is_answer_block = True
+    else:
+        has_ja = is_japanese(full_text)
+        if not has_ja and "___" not in full_text and "(" not in full_text:
+            is_answer_block = True
+        
+    if is_answer_block:
+        # Extract Answer Sentence vs Explanation
+        ans_lines = []
+        expl_lines = []
+        seen_arrow = False
+        
+        for l in lines:
+            if "▶" in l:
+                seen_arrow = True
+                # The part before ▶ might be answer?
+                parts = l.split("▶", 1)
+                if parts[0].strip():
+                     ans_lines.append(parts[0].strip())
+                expl_lines.append("▶ " + parts[1].strip())
+            elif seen_arrow:
+                expl_lines.append(l)
+            else:
+                ans_lines.append(l)
+        
+        # Save
+        if bid not in answers:
+            answers[bid] = " ".join(ans_lines).strip()
+            explanations[bid] = "\n".join(expl_lines).strip()
+        # If duplicates (unlikely for matched blocks), ignore or merge?
+    else:
+        # Question Block, split into Japanese prompt and English question in
+        # the same pass
+        q_data = questions.get(bid)
+        if q_data is None:
+            q_data = questions[bid] = { "ja": [], "en": [] }
+        jp_lines = q_data["ja"]
+        en_lines = q_data["en"]
+        for l in lines:
+            if l == _KIHON: continue
+            # No line can be Japanese if the whole block isn't
+            if has_ja and is_japanese(l):
+                jp_lines.append(l)
+            else:
+                en_lines.append(l)
+
+def tag_lines(lines):
+    """1. Yield ((block_no, id), text) for each kept line, carrying the ID forward."""
+    # block_no changes at every new ID, so a repeated ID still starts its own
+    # block. Lines before the first ID are dropped.
+    block_key = None
+    block_no = 0
+    
+    for line in lines:
+        line = line.strip()
         if not line: continue
         
         # Filter garbage
-        if re.match(r'^F\s+\d+$', line): continue
-        if line.startswith("Tip"): continue
+        if _FCODE_RE.match(line): continue
+        if line.startswith(_TIP): continue
         if "ʁ" in line or "Ͱ" in line: continue # Filter Mojibake
-        if line == "Words to Use": continue
+        if line == _WORDS_TO_USE: continue
         
         # ID Detection
-        id_match = re.match(r'^(\d+(?:-\d+)?)(?:\s+(.*))?$', line)
+        # Only lines starting with a digit can be IDs; skip the regex otherwise
+        id_match = _ID_RE.match(line) if line[0].isdecimal() else None
         
         is_new_id = False
         if id_match:
             pot_id = id_match.group(1)
             pot_content = id_match.group(2) or ""
             
-            if re.match(r'^\d+$', pot_content.strip()): # Page numbers line "14 15"
+            if _DIGITS_RE.match(pot_content.strip()): # Page numbers line "14 15"
                 is_new_id = False
             elif len(pot_id) < 6:
                 is_new_id = True
         
         if is_new_id:
-            id_str = id_match.group(1)
-            content = id_match.group(2) or ""
-            
-            if current_block:
-                blocks.append(current_block)
-            
-            current_block = { "id": id_str, "lines": [] }
-            if content.strip():
-                current_block["lines"].append(content.strip())
-        else:
-            if current_block:
-                 current_block["lines"].append(line)
-    
-    if current_block:
-        blocks.append(current_block)
+            block_no += 1
+            block_key = (block_no, pot_id)
+            # Yielded even when empty so the block exists; the caller drops ""
+            yield block_key, pot_content.strip()
+        elif block_key is not None:
+            yield block_key, line
 
-    # 2. Process Blocks
+def parse_chapter_text_v5(lines):
+    # lines: any iterable of raw lines (e.g. iter_lines_pypdf), or the whole text
+    if isinstance(lines, str):
+        lines = lines.split('\n')
+    
+    # 2. groupby does the block accumulation; each block is filed as soon as
+    # the next ID closes it
     answers = {}
     questions = {}
     explanations = {}
     
-    for block in blocks:
-        bid = block['id']
-        lines = block['lines']
-        full_text = " ".join(lines)
-        
-        # Classification
-        # Answer Block signal: Contains "▶" (Explanation marker) OR is purely English without blanks
-        # Question Block signal: Contains "(___)", "基本", "Tip", or Japanese WITHOUT "▶"
-        
-        is_answer_block = False
-        if "▶" in full_text: 
-            is_answer_block = True
-        elif not is_japanese(full_text) and "___" not in full_text and "(" not in full_text:
-            is_answer_block = True
-            
-        if is_answer_block:
-            # Extract Answer Sentence vs Explanation
-            ans_lines = []
-            expl_lines = []
-            seen_arrow = False
-            
-            for l in lines:
-                if "▶" in l:
-                    seen_arrow = True
-                    # The part before ▶ might be answer?
-                    parts = l.split("▶", 1)
-                    if parts[0].strip():
-                         ans_lines.append(parts[0].strip())
-                    expl_lines.append("▶ " + parts[1].strip())
-                elif seen_arrow:
-                    expl_lines.append(l)
-                else:
-                    ans_lines.append(l)
-            
-            # Save
-            if bid not in answers:
-                answers[bid] = " ".join(ans_lines).strip()
-                explanations[bid] = "\n".join(expl_lines).strip()
-            # If duplicates (unlikely for matched blocks), ignore or merge?
-        else:
-            # Question Block
-            if bid not in questions:
-                questions[bid] = { "lines": lines }
-            else:
-                questions[bid]["lines"].extend(lines)
+    for (_, bid), group in groupby(tag_lines(lines), key=itemgetter(0)):
+        store_block(bid, [text for _, text in group if text], answers, questions, explanations)
 
     # 3. Assembly
     items = []
     
-    all_ids = set(answers.keys()) | set(questions.keys())
-    def sort_key(s):
-        parts = s.split('-')
-        try: return [int(p) for p in parts]
-        except: return [9999]
-    
-    sorted_ids = sorted(list(all_ids), key=sort_key)
+    # Numeric order, keys built once per ID. Every ID came through _ID_RE, so
+    # each part is a decimal int; equal keys ("01"/"1") fall back to the ID
+    # string instead of set iteration order
+    decorated = sorted(
+        ([int(p) for p in bid.split('-')], bid)
+        for bid in answers.keys() | questions.keys()
+    )
     
-    for id_str in sorted_ids:
+    for _, id_str in decorated:
         q_data = questions.get(id_str)
         a_text = answers.get(id_str)
         expl_text = explanations.get(id_str, "")
@@ -255,35 +353,28 @@ def parse_chapter_text_v5(text):
         en_question = ""
         
         if q_data:
-            jp_lines = []
-            en_lines = []
-            for l in q_data['lines']:
-                if l == "基本": continue
-                if is_japanese(l):
-                    jp_lines.append(l)
-                else:
-                    en_lines.append(l)
-            
-            jp_part = " ".join(jp_lines)
-            en_question = " ".join(en_lines)
+            jp_part = " ".join(q_data['ja'])
+            en_question = " ".join(q_data['en'])
             
             # Fallback for splitting mixed raw text?
             # V5 simplification: Trust line classification.
         else:
-             jp_part = "???"
-             en_question = "???"
+             jp_part = _UNKNOWN
+             en_question = _UNKNOWN
 
-        if not a_text: a_text = "???"
+        if not a_text: a_text = _UNKNOWN
 
         # Target Word
-        target_word = "???"
-        if en_question != "???" and a_text != "???":
-            detected = find_answer_part(en_question, a_text)
-            if detected: target_word = detected
-            
+        target_word = _UNKNOWN
         parsed_en = a_text
-        if target_word!= "???" and target_word in a_text:
-             parsed_en = a_text.replace(target_word, f"{{{target_word}}}")
+        if en_question != _UNKNOWN and a_text != _UNKNOWN:
+            detected = find_answer_part(en_question, a_text)
+            if detected:
+                target_word, ans_start, ans_end = detected
+                # Wrap only the located span; replace() would also wrap any
+                # other occurrence of a short answer like "to"
+                if ans_start is not None:
+                    parsed_en = f"{a_text[:ans_start]}{{{target_word}}}{a_text[ans_end:]}"
         
         items.append({
             "id": id_str,
@@ -298,21 +389,20 @@ def parse_chapter_text_v5(text):
 
 
 
-def generate_app(chapter_num, items):
+@lru_cache(maxsize=1)
+def load_template():
+    """Read template.html once and swap the per-chapter parts for sentinels."""
     if not TEMPLATE_FILE.exists():
          return ""
     with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
         template = f.read()
     
-    chapter_title_text = f"Chapter {chapter_num}"
-    template = re.sub(r'<title>.*?</title>', f'<title>Insight App - {chapter_title_text}</title>', template)
-    template = re.sub(
-        r'<h2 id="app-subtitle"([^>]*)>.*?</h2>', 
-        f'<h2 id="app-subtitle"\\1>学習用サイト（{chapter_title_text}）</h2>', 
+    template = _TITLE_RE.sub(f'<title>Insight App - {CHAPTER_SENTINEL}</title>', template)
+    template = _SUBTITLE_RE.sub(
+        f'<h2 id="app-subtitle"\\1>学習用サイト（{CHAPTER_SENTINEL}）</h2>', 
         template
     )
     
-    json_data = json.dumps(items, ensure_ascii=False, indent=4)
     start_marker = "const chapterData = ["
     end_marker = "];"
     
@@ -320,17 +410,46 @@ def generate_app(chapter_num, items):
     if start_idx != -1:
          end_idx = template.find(end_marker, start_idx)
          if end_idx != -1:
-             new_code = f"const chapterData = {json_data};"
+             new_code = f"const chapterData = {DATA_SENTINEL};"
              template = template[:start_idx] + new_code + template[end_idx+2:]
     
     return template
 
+def dump_chapter_data(items):
+    # The array is inlined into a <script>, so compact output is enough
+    if orjson is not None:
+        return orjson.dumps(items).decode("utf-8")
+    return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+
+def generate_app(chapter_num, items, template=None):
+    # template is the sentinel form from load_template(), read once in main
+    if template is None:
+        template = load_template()
+    if not template:
+         return ""
+    
+    chapter_title_text = f"Chapter {chapter_num}"
+    json_data = dump_chapter_data(items)
+    # Chapter first, so the (large) JSON is never rescanned
+    return template.replace(CHAPTER_SENTINEL, chapter_title_text).replace(DATA_SENTINEL, json_data)
+
 def get_chapter_number(filename):
     normalized = unicodedata.normalize('NFKC', filename)
-    match = re.search(r'(\d+)', normalized)
-    if match: return int(match.group(1))
+    match = _NUM_RE.search(normalized)
+    if match: return int(match.group())
     return 999
 
+def process_pdf(pdf_file, template):
+    print(f"Processing {pdf_file.name}...")
+    items = parse_chapter_text_v5(iter_lines_pypdf(pdf_file))
+    print(f"Extracted {len(items)} items.")
+    
+    chap_num = get_chapter_number(pdf_file.name)
+    html_content = generate_app(chap_num, items, template)
+    
+    output_name = f"chapter-{chap_num:02d}.html"
+    return output_name, f"Chapter {chap_num}", html_content
+
 def main():
     print("--- Insight App Generator V5 (Decoupled Matching) ---")
     setup_directories()
@@ -339,23 +458,20 @@ def main():
     files.sort(key=lambda x: get_chapter_number(x.name))
     
     generated_links = []
+    # Read once here and hand the text to the workers
+    template = load_template()
     
-    for pdf_file in files:
-        print(f"Processing {pdf_file.name}...")
-        raw_text = extract_text_pypdf(pdf_file)
-        
-        items = parse_chapter_text_v5(raw_text)
-        print(f"Extracted {len(items)} items.")
-        
-        chap_num = get_chapter_number(pdf_file.name)
-        html_content = generate_app(chap_num, items)
-        
-        output_name = f"chapter-{chap_num:02d}.html"
+    # Each PDF is independent: extract + parse + render in worker processes,
+    # then write the pages from here in chapter order.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(process_pdf, files, repeat(template)))
+    
+    for output_name, title, html_content in results:
         output_path = DOCS_DIR / output_name
         
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        generated_links.append((output_name, f"Chapter {chap_num}"))
+        # Encoded once and written in a single call, no text-layer wrapper
+        output_path.write_bytes(html_content.encode("utf-8"))
+        generated_links.append((output_name, title))
 
     print("Updating Index...")
     index_path = DOCS_DIR / "index.html"
@@ -382,13 +498,12 @@ def main():
     </body>
     </html>
     """
-    with open(index_path, "w", encoding="utf-8") as f:
-        f.write(index_html)
+    index_path.write_bytes(index_html.encode("utf-8"))
     
     # Git operations (commented out for safety during dev, user can run manually or I can uncomment)
-    # run_command("git add .")
-    # run_command('git commit -m "Update parsing V5"', cwd=os.getcwd())
-    # run_command("git push origin main", cwd=os.getcwd())
+    # if (run_command(["git", "add", "."]) is not None
+    #         and run_command(["git", "commit", "-m", "Update parsing V5"]) is not None):
+    #     run_command(["git", "push", "origin", "main"])
 
 if __name__ == "__main__":
     main()
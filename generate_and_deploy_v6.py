@@ -1,36 +1,153 @@
 
-import docx
-from docx.shared import RGBColor
 import os
 import re
 import json
 import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
+from lxml import etree
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration
 WORD_DIR = Path("word_files")
 DOCS_DIR = Path("docs")
 TEMPLATE_FILE = Path("template.html")
 
+# Compiled once instead of going through re's pattern cache for every paragraph
+# ID prefix: '1', '1-1', '017', '17'; group 1 drops the leading zero
+_ID_RE = re.compile(r'^0?(\d+(?:-\d+)?)')
+_CHECKBOX_RE = re.compile(r'[□]+')
+_FCODE_RE = re.compile(r'F\s*\d+\s*')
+# What's left to clean from a colored sentence once its ID is off
+_CHECKBOX_FCODE_RE = re.compile(_CHECKBOX_RE.pattern+'|'+_FCODE_RE.pattern)
+# Colored runs made only of spacing/arrows aren't answers
+_SEPARATOR_CHARS = frozenset(' \t\n➡・')
+# Japanese lines carrying any of these are labels, not the prompt
+_JA_SKIP_RE = re.compile(r'基本|発展|Words to Use')
+# Section headers that never belong to an item
+_HEADER_PREFIXES = ("File ", "Grasp ", "Words to Use")
+_EMPTY_BRACES_RE = re.compile(r'\{\s*\}')
+_WS_RE = re.compile(r'\s+')
+_TITLE_RE = re.compile(r'<title>.*?</title>')
+_SUBTITLE_RE = re.compile(r'<h2 id="app-subtitle"([^>]*)>.*?</h2>')
+_NUM_RE = re.compile(r'(\d+)')
+# Every block whose character names contain HIRAGANA, KATAKANA or CJK (what
+# the unicodedata.name() scan tested): CJK radicals, kana, CJK strokes, small
+# katakana, circled katakana, CJK Extension A, CJK Unified and Compatibility
+# Ideographs, halfwidth katakana, kana supplements, squared/bracketed CJK,
+# CJK Extensions B-H
+_JA_CHAR_RE = re.compile(
+    r'[\u2e80-\u2eff\u3040-\u30ff\u31c0-\u31e3\u31f0-\u31ff\u32d0-\u32fe'
+    r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff65-\uff9f'
+    r'\U0001aff0-\U0001affe\U0001b000-\U0001b001\U0001b11f-\U0001b122'
+    r'\U0001b150-\U0001b167\U0001f200-\U0001f202\U0001f210-\U0001f23b'
+    r'\U0001f240-\U0001f248\U00020000-\U0002fa1f\U00030000-\U000323af]'
+)
+
+# Placeholders load_template() leaves in the template
+CHAPTER_SENTINEL = "{{CHAPTER}}"
+DATA_SENTINEL = "{{DATA}}"
+
+# Paragraph and run contents are read off word/document.xml directly;
+# python-docx's package load and Paragraph/Run/Font proxies dominated the runtime
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS = {"w": W_NS}
+W_P = f"{{{W_NS}}}p"
+W_TAB = f"{{{W_NS}}}tab"
+W_PTAB = f"{{{W_NS}}}ptab"
+W_BR = f"{{{W_NS}}}br"
+W_CR = f"{{{W_NS}}}cr"
+W_NO_BREAK_HYPHEN = f"{{{W_NS}}}noBreakHyphen"
+W_HYPERLINK = f"{{{W_NS}}}hyperlink"
+W_TYPE = f"{{{W_NS}}}type"
+
+_run_content = etree.XPath("w:br | w:cr | w:noBreakHyphen | w:ptab | w:t | w:tab", namespaces=NS)
+_para_content = etree.XPath("w:r | w:hyperlink", namespaces=NS)
+_hyperlink_runs = etree.XPath("w:r", namespaces=NS)
+_run_color = etree.XPath("w:rPr/w:color/@w:val", namespaces=NS)
+# Colors that don't mark an answer (run.font.color.rgb was None or these)
+_PLAIN_COLORS = ("AUTO", "FFFFFF", "000000")
+
 def setup_directories():
     if not DOCS_DIR.exists():
         DOCS_DIR.mkdir()
 
+@lru_cache(maxsize=None)
 def get_chapter_number(filename):
-    normalized = unicodedata.normalize('NFKC', filename)
-    match = re.search(r'(\d+)', normalized)
+    # NFKC leaves ASCII untouched; only full-width names like "１章" need it
+    normalized = filename if filename.isascii() else unicodedata.normalize('NFKC', filename)
+    match = _NUM_RE.search(normalized)
     if match: return int(match.group(1))
     return 999
 
 def is_japanese(text):
-    for char in text:
-        try:
-            name = unicodedata.name(char, "")
-            if "HIRAGANA" in name or "KATAKANA" in name or "CJK" in name:
-                return True
-        except:
-             pass
-    return False
+    # ASCII-only strings (most English lines) are flagged as such by CPython
+    if text.isascii():
+        return False
+    # The character-class scan runs in C and stops at the first hit
+    return _JA_CHAR_RE.search(text) is not None
+
+def run_text(r):
+    """Text of a <w:r>, translating tabs and breaks the way python-docx does."""
+    parts = []
+    for e in _run_content(r):
+        tag = e.tag
+        if tag == W_TAB or tag == W_PTAB:
+            parts.append("\t")
+        elif tag == W_BR:
+            if e.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag == W_CR:
+            parts.append("\n")
+        elif tag == W_NO_BREAK_HYPHEN:
+            parts.append("-")
+        else:
+            parts.append(e.text or "")
+    return "".join(parts)
+
+def paragraph_runs(p):
+    """Text of a <w:p> (as Paragraph.text) and its non-empty (text, colored) runs."""
+    # Hyperlinked runs count towards the text only; p.runs doesn't include them
+    parts = []
+    runs = []
+    for e in _para_content(p):
+        if e.tag == W_HYPERLINK:
+            parts.extend(run_text(r) for r in _hyperlink_runs(e))
+        else:
+            t = run_text(e)
+            parts.append(t)
+            if t:
+                runs.append((t, is_colored_run(e)))
+    return "".join(parts), runs
+
+def load_paragraphs(docx_path):
+    """Parse the document once into parallel lists of paragraph texts and runs."""
+    # Non-empty body-level paragraphs only (doc.paragraphs), text stripped;
+    # no XML nodes outlive this call
+    with zipfile.ZipFile(docx_path) as z:
+        with z.open("word/document.xml") as f:
+            body = etree.parse(f).getroot().find("w:body", NS)
+    para_texts = []
+    para_runs = []
+    for p in body.findall(W_P):
+        text, runs = paragraph_runs(p)
+        text = text.strip()
+        if not text: continue
+        para_texts.append(text)
+        para_runs.append(runs)
+    return para_texts, para_runs
+
+def is_colored_run(r):
+    """True when the run has an explicit color other than auto/white/black."""
+    color = _run_color(r)
+    return bool(color) and color[0].upper() not in _PLAIN_COLORS
 
 def clean_text(text):
     # Remove hidden zero markers often found in these docs (e.g. '0'(white) before '17')
@@ -38,40 +155,159 @@ def clean_text(text):
     # We might want to remove weird control characters.
     return text.strip()
 
+def strip_id_prefix(text, bid):
+    """text without a leading bid (optionally "0"-padded)."""
+    # re.sub(r'^0?'+re.escape(bid)+r'\s*', '', text) without compiling a
+    # pattern for every ID. The whitespace after the ID is left for the
+    # callers' single final strip(), which drops the same characters as \s
+    if text.startswith("0") and text.startswith(bid, 1):
+        return text[len(bid)+1:]
+    if text.startswith(bid):
+        return text[len(bid):]
+    return text
+
+def new_block(bid):
+    """Per-ID accumulators, filled as the block's paragraphs stream past."""
+    return {
+        "id": bid,
+        "ja": [],
+        "q": [],
+        "ans": [], # Will build the English sentence with {}
+        "words": [], # Plain list of answers
+        "expl": [],
+    }
+
+def classify_paragraph(block, text, runs):
+    """File one paragraph of a block as Japanese, question, answer or explanation."""
+    # Remove ID and checkboxes. F-codes stay for now: lines are classified
+    # before they lose them
+    clean_line = _CHECKBOX_RE.sub('', strip_id_prefix(text, block["id"])).strip()
+    
+    # Classification
+    if "▶" in clean_line or clean_line.startswith("Tip"):
+        block["expl"].append(clean_line)
+        return
+    
+    if is_japanese(clean_line):
+        # Filter specific keywords ("基本", "発展", "Words to Use")
+        if _JA_SKIP_RE.search(clean_line): return
+        if clean_line.startswith("○"): return # Vocab notes
+        
+        block["ja"].append(clean_line)
+        return
+    
+    # English Processing
+    # 1. Filter "F 000" refs (often at start or end)
+    # e.g. "F 023  it is raining" -> "it is raining"
+    clean_line = _FCODE_RE.sub('', clean_line).strip()
+    
+    # Lines with blanks are questions whatever their colors, so only
+    # the rest need the colored reconstruction below
+    has_blanks = "(" in clean_line or "（" in clean_line or "_" in clean_line
+    if has_blanks:
+        block["q"].append(clean_line)
+        return
+    
+    has_valid_color = False
+    colored_segments = []
+    sent_parts = [] # joined once into reconstructed_sent
+    
+    for r_text, colored in runs:
+        # Filter F-codes from run text too if possible? 
+        # Doing it on reconstructed string is safer for structure.
+        
+        is_colored = False
+        if colored:
+            # r_text is never empty, so this is "not only separators"
+            if not _SEPARATOR_CHARS.issuperset(r_text):
+                 is_colored = True
+                
+        if is_colored:
+            has_valid_color = True
+            sent_parts.append(f"{{{r_text}}}")
+            colored_segments.append(r_text.strip())
+        else:
+            sent_parts.append(r_text)
+    
+    # Clean reconstructed (ID, checkboxes, F-codes)
+    reconstructed_sent = _CHECKBOX_FCODE_RE.sub('', strip_id_prefix("".join(sent_parts), block["id"])).strip()
+    
+    # Decision
+    if has_valid_color:
+        block["ans"].append(reconstructed_sent)
+        block["words"].extend(colored_segments)
+    else:
+        if not block["ans"]:
+             block["q"].append(clean_line)
+        else:
+             block["expl"].append(clean_line)
+
+def build_item(bid, block):
+    # Assemble
+    # Lines are stripped and non-empty, so the join needs no strip()
+    ja_text = " ".join(block["ja"])
+    
+    # Post-process Japanese: Keep only first sentence?
+    # If it contains '。', keep up to the first '。'.
+    # One find and a slice; split() built a list of every sentence
+    end = ja_text.find("。")
+    if end != -1:
+        ja_text = ja_text[:end+1]
+        # If the remainder had useful info? Usually it's hints.
+    
+    # Remove any remaining "○" or bracketed hints if they were inline?
+    # e.g. "Translation (Hint)" -> "Translation"
+    # Be careful not to remove grammar brackets or parens in math? (English app, so ok).
+    
+    q_text = " ".join(block["q"])
+    ans_sentence_parts = block["ans"]
+    en_text_with_brackets = " ".join(ans_sentence_parts) if ans_sentence_parts else "???"
+    
+    # Cleanup brackets
+    en_text_with_brackets = _EMPTY_BRACES_RE.sub('', en_text_with_brackets)
+    # Cleanup double spaces
+    en_text_with_brackets = _WS_RE.sub(' ', en_text_with_brackets).strip()
+    
+    answer_text = ", ".join([w for w in block["words"] if w])
+    
+    return {
+        "id": bid,
+        "ja": ja_text,
+        "en": en_text_with_brackets,
+        "answer": answer_text,
+        "explanation": "\n".join(block["expl"]),
+        "question": q_text
+    }
+
 def extract_items_from_docx(docx_path):
-    doc = docx.Document(docx_path)
+    para_texts, para_runs = load_paragraphs(docx_path)
     
     # Storage
-    # blocks = { "id": [ { "text": "...", "runs": [...] } ] }
+    # blocks = { "id": accumulators from new_block() }
+    # An ID comes back in the answer section after its question, so blocks
+    # stay open for the whole document rather than closing at the next ID
     blocks = {}
-    current_id = None
+    block = None
     
     # Regex for ID: '1', '1-1', '017', '17'
     # Valid IDs usually don't have text on the same line in this format?
     # Based on dump: "017   駅に着いた..." (Japanese on same line)
     # "018   It had been..." (English on same line)
-    # So ID is a prefix.
+    # So ID is a prefix (_ID_RE).
     
-    id_pattern = re.compile(r'^0?(\d+(?:-\d+)?)')
-    
-    all_paras = doc.paragraphs
-    
-    for p in all_paras:
-        text = p.text.strip()
-        if not text: continue
-        
-        # Check for ID match
-        # Note: Sometimes there's a white '0' prefix uncaptured by .text if it's separate?
-        # No, .text includes all.
-        match = id_pattern.match(text)
-        
+    for text, runs in zip(para_texts, para_runs):
         # Filter false positives: Page numbers, dates?
         # ID is usually followed by space.
         
         # Specialized filter for "File X" headers
-        if text.startswith("File ") or text.startswith("Grasp ") or text.startswith("Words to Use"):
+        if text.startswith(_HEADER_PREFIXES):
             continue
             
+        # Check for ID match
+        # Note: Sometimes there's a white '0' prefix uncaptured by .text if it's separate?
+        # No, .text includes all.
+        match = _ID_RE.match(text)
+        
         if match:
              # Found a line starting with ID
              # Use the normalized ID (remove leading zero if regex caught it, but group 1 is the main part)
@@ -79,17 +315,13 @@ def extract_items_from_docx(docx_path):
              raw_id = match.group(1)
              
              # Heuristic: IDs are short. content follows.
-             current_id = raw_id
-             
-             if current_id not in blocks:
-                 blocks[current_id] = []
+             block = blocks.get(raw_id)
+             if block is None:
+                 block = blocks[raw_id] = new_block(raw_id)
         
-        # Append paragraph info to current ID
-        if current_id:
-            blocks[current_id].append(p)
-    
-    # Now process each block
-    items = []
+        # Classify the paragraph into the current ID's block right away
+        if block is not None:
+            classify_paragraph(block, text, runs)
     
     # Sort IDs
     def sort_key(s):
@@ -97,142 +329,22 @@ def extract_items_from_docx(docx_path):
         try: return [int(p) for p in parts]
         except: return [9999]
     
-    sorted_ids = sorted(blocks.keys(), key=sort_key)
-    
-    for bid in sorted_ids:
-        paras = blocks[bid]
-        
-        # Components
-        ja_lines = []
-        q_lines = []
-        ans_sentence_parts = [] # Will build the English sentence with {}
-        ans_raw_words = [] # Plain list of answers
-        expl_lines = []
-        
-        for p in paras:
-            text = p.text.strip()
-            if not text: continue
-            
-            # Remove ID
-            clean_line = re.sub(r'^0?'+re.escape(bid)+r'\s*', '', text).strip()
-            # Remove checkboxes
-            clean_line = re.sub(r'[□]+', '', clean_line).strip()
-            
-            # Classification
-            if "▶" in clean_line or clean_line.startswith("Tip"):
-                expl_lines.append(clean_line)
-                continue
-            
-            if is_japanese(clean_line):
-                # Filter specific keywords
-                if "基本" in clean_line: continue
-                if "発展" in clean_line: continue
-                if clean_line.startswith("○"): continue # Vocab notes
-                
-                # Check for "Words to Use" context?
-                if "Words to Use" in clean_line: continue
-                
-                ja_lines.append(clean_line)
-                continue
-            
-            # English Processing
-            # 1. Filter "F 000" refs (often at start or end)
-            # e.g. "F 023  it is raining" -> "it is raining"
-            clean_line = re.sub(r'F\s*\d+\s*', '', clean_line).strip()
-            
-            has_valid_color = False
-            colored_segments = []
-            reconstructed_sent = ""
-            
-            for run in p.runs:
-                r_text = run.text
-                if not r_text: continue
-                
-                # Filter F-codes from run text too if possible? 
-                # Doing it on reconstructed string is safer for structure.
-                
-                is_colored = False
-                if run.font.color and run.font.color.rgb:
-                    if run.font.color.rgb != RGBColor(255, 255, 255) and run.font.color.rgb != RGBColor(0, 0, 0):
-                        if not re.match(r'^[ \t\n➡・]+$', r_text):
-                             is_colored = True
-                        
-                if is_colored:
-                    has_valid_color = True
-                    reconstructed_sent += f"{{{r_text}}}"
-                    colored_segments.append(r_text.strip())
-                else:
-                    reconstructed_sent += r_text
-            
-            # Clean reconstructed (ID, checkboxes, F-codes)
-            reconstructed_sent = re.sub(r'^0?'+re.escape(bid)+r'\s*', '', reconstructed_sent).strip()
-            reconstructed_sent = re.sub(r'[□]+', '', reconstructed_sent).strip()
-            reconstructed_sent = re.sub(r'F\s*\d+\s*', '', reconstructed_sent).strip()
-            
-            # Decision
-            has_blanks = "(" in clean_line or "（" in clean_line or "_" in clean_line
-            
-            if has_blanks:
-                q_lines.append(clean_line)
-            elif has_valid_color:
-                ans_sentence_parts.append(reconstructed_sent)
-                ans_raw_words.extend(colored_segments)
-            else:
-                if not ans_sentence_parts:
-                     q_lines.append(clean_line)
-                else:
-                     expl_lines.append(clean_line)
+    return [build_item(bid, blocks[bid]) for bid in sorted(blocks, key=sort_key)]
 
-        # Assemble
-        ja_text = " ".join(ja_lines).strip()
-        
-        # Post-process Japanese: Keep only first sentence?
-        # If it contains '。', keep up to the first '。'.
-        if "。" in ja_text:
-            parts = ja_text.split("。")
-            ja_text = parts[0] + "。"
-            # If the remainder had useful info? Usually it's hints.
-        
-        # Remove any remaining "○" or bracketed hints if they were inline?
-        # e.g. "Translation (Hint)" -> "Translation"
-        # Be careful not to remove grammar brackets or parens in math? (English app, so ok).
-        
-        q_text = " ".join(q_lines)
-        en_text_with_brackets = " ".join(ans_sentence_parts) if ans_sentence_parts else "???"
-        
-        # Cleanup brackets
-        en_text_with_brackets = re.sub(r'\{\s*\}', '', en_text_with_brackets)
-        # Cleanup double spaces
-        en_text_with_brackets = re.sub(r'\s+', ' ', en_text_with_brackets).strip()
-        
-        answer_text = ", ".join([w for w in ans_raw_words if w])
-        
-        items.append({
-            "id": bid,
-            "ja": ja_text,
-            "en": en_text_with_brackets,
-            "answer": answer_text,
-            "explanation": "\n".join(expl_lines),
-            "question": q_text
-        })
-        
-    return items
-
-def generate_app(chapter_num, items):
+@lru_cache(maxsize=1)
+def load_template():
+    """Read template.html once and swap the per-chapter parts for sentinels."""
     if not TEMPLATE_FILE.exists():
          return ""
     with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
         template = f.read()
     
-    chapter_title_text = f"Chapter {chapter_num}"
-    template = re.sub(r'<title>.*?</title>', f'<title>Insight App - {chapter_title_text}</title>', template)
-    template = re.sub(
-        r'<h2 id="app-subtitle"([^>]*)>.*?</h2>', 
-        f'<h2 id="app-subtitle"\\1>学習用サイト（{chapter_title_text}）</h2>', 
+    template = _TITLE_RE.sub(f'<title>Insight App - {CHAPTER_SENTINEL}</title>', template)
+    template = _SUBTITLE_RE.sub(
+        f'<h2 id="app-subtitle"\\1>学習用サイト（{CHAPTER_SENTINEL}）</h2>', 
         template
     )
     
-    json_data = json.dumps(items, ensure_ascii=False, indent=4)
     start_marker = "const chapterData = ["
     end_marker = "];"
     
@@ -240,40 +352,70 @@ def generate_app(chapter_num, items):
     if start_idx != -1:
          end_idx = template.find(end_marker, start_idx)
          if end_idx != -1:
-             new_code = f"const chapterData = {json_data};"
+             new_code = f"const chapterData = {DATA_SENTINEL};"
              template = template[:start_idx] + new_code + template[end_idx+2:]
     
     return template
 
+def dump_chapter_data(items):
+    # The array is inlined into a <script>, so compact output is enough
+    if orjson is not None:
+        return orjson.dumps(items).decode("utf-8")
+    return json.dumps(items, ensure_ascii=False, separators=(',', ':'))
+
+def generate_app(chapter_num, items, template=None):
+    # template is the sentinel form from load_template(), read once in main
+    if template is None:
+        template = load_template()
+    if not template:
+         return ""
+    
+    chapter_title_text = f"Chapter {chapter_num}"
+    json_data = dump_chapter_data(items)
+    # Chapter first, so the (large) JSON is never rescanned
+    return template.replace(CHAPTER_SENTINEL, chapter_title_text).replace(DATA_SENTINEL, json_data)
+
+def process_docx(docx_file, chap_num, template):
+    """Extract, render and write one chapter; (output_name, title) or None if it failed."""
+    print(f"Processing {docx_file.name}...")
+    try:
+        items = extract_items_from_docx(docx_file)
+        print(f"Extracted {len(items)} items.")
+        
+        html_content = generate_app(chap_num, items, template)
+        
+        output_name = f"chapter-{chap_num:02d}.html"
+        output_path = DOCS_DIR / output_name
+        
+        # Encoded once and written in a single call, no text-layer wrapper
+        output_path.write_bytes(html_content.encode("utf-8"))
+        return output_name, f"Chapter {chap_num}"
+    except Exception as e:
+        print(f"FAILED to process {docx_file.name}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
 def main():
     print("--- Insight App Generator V6 (Word/Color Matching) ---")
     setup_directories()
     
     # Get all docx files
-    files = list(WORD_DIR.glob("*.docx"))
-    files.sort(key=lambda x: get_chapter_number(x.name))
+    # Chapter numbers worked out once per file, reused for the sort and
+    # handed to the workers
+    keyed = [(get_chapter_number(f.name), f) for f in WORD_DIR.glob("*.docx")]
+    keyed.sort(key=lambda kf: kf[0])
+    chapter_ids = [n for n, _ in keyed]
+    files = [f for _, f in keyed]
     
-    generated_links = []
+    # Read once here and hand the text to the workers
+    template = load_template()
     
-    for docx_file in files:
-        print(f"Processing {docx_file.name}...")
-        try:
-            items = extract_items_from_docx(docx_file)
-            print(f"Extracted {len(items)} items.")
-            
-            chap_num = get_chapter_number(docx_file.name)
-            html_content = generate_app(chap_num, items)
-            
-            output_name = f"chapter-{chap_num:02d}.html"
-            output_path = DOCS_DIR / output_name
-            
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            generated_links.append((output_name, f"Chapter {chap_num}"))
-        except Exception as e:
-            print(f"FAILED to process {docx_file.name}: {e}")
-            import traceback
-            traceback.print_exc()
+    # Each document is independent, so whole chapters run in worker
+    # processes; map() keeps the links in chapter order
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(process_docx, files, chapter_ids, repeat(template)))
+    generated_links = [r for r in results if r is not None]
 
     print("Updating Index...")
     index_path = DOCS_DIR / "index.html"
@@ -300,8 +442,7 @@ def main():
     </body>
     </html>
     """
-    with open(index_path, "w", encoding="utf-8") as f:
-        f.write(index_html)
+    index_path.write_bytes(index_html.encode("utf-8"))
     
     print("Deploying...")
     # run_command("git add .")
@@ -0,0 +1,138 @@
+
+import argparse
+import os
+import re
+from functools import lru_cache
+from pypdf import PdfReader
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+DEFAULT_PDF = "pdfs/1章.pdf"
+STRUCTURE_CHAPTERS = ["pdfs/1章.pdf", "pdfs/10章.pdf", "pdfs/24章.pdf"]
+
+# All line classes in one alternation; the matching group name is the kind.
+_CLASSIFY_RE = re.compile(
+    r'(?P<GARBAGE>Tip|F\s*\d+)'
+    r'|(?P<ID_ONLY>\d+(?:-\d+)?$)'
+    r'|(?P<ID_JP>\d+(?:-\d+)?\s+[^a-zA-Z].*$)'
+    r'|(?P<ID_EN>\d+(?:-\d+)?\s+[a-zA-Z].*$)'
+)
+
+def extract_pypdf(path):
+    """Page text the way v3 reads it, so debug shows the lines v3 classifies."""
+    reader = PdfReader(path)
+    parts = []
+    for page in reader.pages:
+        parts.append(page.extract_text())
+        parts.append("\n")
+    return "".join(parts)
+
+def extract_pymupdf(path):
+    if pymupdf is None:
+        print("PyMuPDF is not installed, falling back to pypdf")
+        return extract_pypdf(path)
+    try:
+        doc = pymupdf.open(path)
+        try:
+            return "\n".join(page.get_text("text") for page in doc if page.get_fonts())
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"PyMuPDF failed ({e}), falling back to pypdf")
+        return extract_pypdf(path)
+
+# Same --backend choices and default as the v1/v2/v4 generators
+EXTRACTORS = {
+    "pypdf": extract_pypdf,
+    "pymupdf": extract_pymupdf,
+}
+
+@lru_cache(maxsize=None)
+def load_text(path, backend="pypdf"):
+    """Extract text once per path; every subcommand in this process shares it."""
+    return EXTRACTORS[backend](path)
+
+def analyze(pdf_path=DEFAULT_PDF, backend="pypdf"):
+    """Dump the start of the extracted text."""
+    if not os.path.exists(pdf_path):
+        print(f"Error: {pdf_path} not found.")
+        return
+    try:
+        text = load_text(pdf_path, backend)
+        print(f"--- Extracted Text from {pdf_path} ---")
+        print(text[:3000]) # Print first 3000 chars to see enough context
+        print("\n--- End of Text ---")
+    except Exception as e:
+        print(f"Error: {e}")
+
+def dump_text(pdf_path=DEFAULT_PDF, backend="pypdf"):
+    """Print the raw start of the extracted text, without headers."""
+    print(load_text(pdf_path, backend)[:2000])
+
+def structure(path, backend="pypdf"):
+    """Print the first lines of a chapter with line numbers."""
+    print(f"\n{'='*20}\nAnalyzing {path}\n{'='*20}")
+    if not os.path.exists(path):
+        print("Not found")
+        return
+
+    try:
+        lines = load_text(path, backend).split('\n')
+        # Print first 200 lines with line numbers for inspection
+        for i, line in enumerate(lines[:200]):
+            print(f"{i:03d}: {line.strip()}")
+
+        print("\n... (truncated) ...")
+    except Exception as e:
+        print(e)
+
+def debug(pdf_path=DEFAULT_PDF, backend="pypdf"):
+    """Replicate the v3 classify logic on the first lines of a chapter."""
+    if not os.path.exists(pdf_path):
+        return
+    lines = load_text(pdf_path, backend).split('\n')
+
+    for i, line in enumerate(lines[:100]):
+        kind = "UNKNOWN"
+        line = line.strip()
+
+        m = _CLASSIFY_RE.match(line)
+
+        if not line: kind="EMPTY"
+        elif m: kind = m.lastgroup
+        elif '(' in line and ')' in line: kind="Q_LINE"
+
+        print(f"{i:03d} [{kind}] {line}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF inspection tools used while tuning the parsers.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--backend", choices=sorted(EXTRACTORS), default="pypdf",
+                        help="PDF text extractor (default: pypdf)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("analyze", parents=[common], help="dump the start of the extracted text")
+    p.add_argument("pdf", nargs="?", default=DEFAULT_PDF)
+    p = sub.add_parser("text", parents=[common], help="print the raw start of the extracted text")
+    p.add_argument("pdf", nargs="?", default=DEFAULT_PDF)
+    p = sub.add_parser("structure", parents=[common], help="print numbered lines of several chapters")
+    p.add_argument("pdfs", nargs="*", default=STRUCTURE_CHAPTERS)
+    p = sub.add_parser("debug", parents=[common], help="show how the v3 classifier sees each line")
+    p.add_argument("pdf", nargs="?", default=DEFAULT_PDF)
+    sub.add_parser("all", parents=[common], help="run analyze, structure and debug with their defaults")
+    args = parser.parse_args(argv)
+
+    if args.command in ("analyze", "all"):
+        analyze(getattr(args, "pdf", DEFAULT_PDF), args.backend)
+    if args.command == "text":
+        dump_text(args.pdf, args.backend)
+    if args.command in ("structure", "all"):
+        for path in getattr(args, "pdfs", STRUCTURE_CHAPTERS):
+            structure(path, args.backend)
+    if args.command in ("debug", "all"):
+        debug(getattr(args, "pdf", DEFAULT_PDF), args.backend)
+
+if __name__ == "__main__":
+    main()